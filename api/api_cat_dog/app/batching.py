@@ -0,0 +1,118 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import torch
+
+from app.config import Config
+from app.executors import BoundedExecutor, ExecutorSaturated, inference_pool
+from app.metrics import BATCH_SIZE, STAGE_SECONDS
+from app.precision import autocast, resolve_dtype
+from app.preprocessing import BatchBuffer
+
+
+class BatchScheduler:
+    """Agrupa requisições concorrentes em um único lote de inferência.
+
+    Cada requisição envia seu tensor (C, H, W) e aguarda um future. O worker
+    junta o que chegar em até ``max_wait_ms`` (ou até ``max_batch_size``
+    itens), executa um único forward pass e distribui os resultados.
+    """
+
+    def __init__(self, model, max_batch_size: int = Config.BATCH_MAX_SIZE,
+                 max_wait_ms: float = Config.BATCH_MAX_WAIT_MS,
+                 max_queue_size: int = Config.MAX_PENDING_REQUESTS,
+                 executor: BoundedExecutor = inference_pool):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.executor = executor
+        # Só o pool de inferência (um único worker) escreve neste buffer
+        self._buffer = BatchBuffer(max_batch_size, Config.IMAGE_SIZE)
+        self._dtype = resolve_dtype()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Inicia o worker de batching no event loop atual"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Encerra o worker e cancela as requisições pendentes"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, tensor: torch.Tensor) -> float:
+        """Enfileira um tensor já transformado e retorna a saída do modelo"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((tensor, future))
+        except asyncio.QueueFull:
+            raise ExecutorSaturated("Fila de inferência cheia, tente novamente em instantes")
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self) -> List[Tuple[torch.Tensor, asyncio.Future]]:
+        """Aguarda o primeiro item e agrega os próximos até o limite de tempo/tamanho"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Primeiro drena o que já está na fila, sem esperar
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Descarta requisições cujo cliente já desistiu
+        return [(tensor, future) for tensor, future in batch if not future.done()]
+
+    def _forward(self, tensors: List[torch.Tensor]) -> List[float]:
+        """Executa um único forward pass para o lote inteiro"""
+        BATCH_SIZE.observe(len(tensors))
+        with STAGE_SECONDS.time(stage="inference_forward"):
+            batch = self._buffer.stack(tensors).to(Config.DEVICE)
+            if Config.CHANNELS_LAST:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            with torch.no_grad(), autocast(self._dtype):
+                output = self.model(batch)
+            return output.float().view(-1).tolist()
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            try:
+                outputs = await self.executor.run(self._forward, [tensor for tensor, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
@@ -0,0 +1,117 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def content_hash(contents: bytes) -> str:
+    """Hash SHA-256 dos bytes enviados, usado como identidade da imagem"""
+    return hashlib.sha256(contents).hexdigest()
+
+
+class PredictionCache:
+    """Cache de predições indexado pelo hash do upload e pela versão do modelo.
+
+    A camada em memória é um LRU limitado a ``max_entries``. Se ``db_path`` for
+    informado, uma tabela SQLite funciona como segunda camada persistente,
+    sobrevivendo a reinícios da API. Os métodos são chamados a partir do
+    ``cpu_pool``, por isso o LRU é protegido por lock.
+    """
+
+    def __init__(self, model_version: str, max_entries: int, db_path: Optional[str] = None):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.db_path:
+            self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_cache (
+                cache_key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                raw_output REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def make_key(self, digest: str) -> str:
+        return f"{self.model_version}:{digest}"
+
+    def lookup(self, contents: bytes) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Calcula o hash do upload e retorna (hash, predição em cache ou None)"""
+        digest = content_hash(contents)
+        key = self.make_key(digest)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return digest, cached
+
+        cached = self._load_persistent(key)
+        with self._lock:
+            if cached is not None:
+                self.persistent_hits += 1
+                self._store_memory(key, cached)
+            else:
+                self.misses += 1
+        return digest, cached
+
+    def put(self, digest: str, value: Dict[str, Any]):
+        """Armazena a predição nas duas camadas"""
+        key = self.make_key(digest)
+        with self._lock:
+            self._store_memory(key, value)
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('''
+                INSERT OR REPLACE INTO prediction_cache
+                (cache_key, filename, prediction, confidence, raw_output)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, value["filename"], value["prediction"],
+                  value["confidence"], value["raw_output"]))
+            conn.commit()
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+            "persistent": bool(self.db_path)
+        }
+
+    def _store_memory(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_persistent(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.db_path:
+            return None
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('''
+            SELECT filename, prediction, confidence, raw_output
+            FROM prediction_cache WHERE cache_key = ?
+        ''', (key,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
@@ -1,20 +1,67 @@
 import torch
-from torchvision import transforms
 import os
+from app.preprocessing import FastTransform
 
 class Config:
-    DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    MODEL_BACKEND = os.getenv("MODEL_BACKEND", "eager")  # eager, torchscript, onnxruntime ou int8
+    # Os backends onnxruntime e int8 executam apenas em CPU
+    CPU_ONLY_BACKENDS = ("onnxruntime", "int8")
+    DEVICE = torch.device("cuda" if torch.cuda.is_available() and MODEL_BACKEND not in CPU_ONLY_BACKENDS else "cpu")
     IMAGE_SIZE = (224, 224)
     MEAN = [0.485, 0.456, 0.406]
     STD = [0.229, 0.224, 0.225]
     MODEL_PATH = os.path.join(os.path.dirname(__file__), "cat_dog_classifier.pth")
+    TORCHSCRIPT_PATH = os.path.join(os.path.dirname(__file__), "cat_dog_classifier.torchscript.pt")
+    ONNX_PATH = os.path.join(os.path.dirname(__file__), "cat_dog_classifier.onnx")
+    QUANTIZED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "cat_dog_classifier.int8.pt")
+    # Precisão mista no backend eager: fp32, bf16 (CPU ou CUDA), fp16 (só CUDA) ou auto
+    PRECISION = os.getenv("PRECISION", "fp32")
+    CHANNELS_LAST = os.getenv("CHANNELS_LAST", "0") == "1"  # Formato NHWC para as convoluções
+    UPLOAD_DIR = "uploads"
+    DB_PATH = "predictions.db"
     THRESHOLD = 0.5  # Limiar para classificação
     UNCERTAIN_THRESHOLD = 0.3  # Se a probabilidade estiver entre 0.3-0.7, considera incerto
 
+    # Micro-batching: requisições concorrentes são agrupadas em um único forward pass
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+    BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+    # Executores: inferência e decode/encode rodam fora do event loop
+    INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 1)))
+    DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    MAX_PENDING_REQUESTS = int(os.getenv("MAX_PENDING_REQUESTS", "64"))  # Acima disso responde 503
+
+    # Endpoint /predict/batch/
+    BATCH_MAX_INFLIGHT = int(os.getenv("BATCH_MAX_INFLIGHT", "16"))  # Itens do lote processados ao mesmo tempo
+    # Tamanho máximo de um arquivo ou .zip do lote (mantidos inteiros em memória) e de cada membro de um .tar
+    BATCH_MAX_PART_BYTES = int(os.getenv("BATCH_MAX_PART_BYTES", str(64 * 1024 * 1024)))
+
+    # Cache de predições por hash do conteúdo (a camada SQLite é opcional)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH")  # Ex.: "prediction_cache.db"
+
+    # Armazenamento dos uploads por hash do conteúdo (uploads/ab/cd/<hash>.<ext>)
+    UPLOAD_SHARD_DEPTH = int(os.getenv("UPLOAD_SHARD_DEPTH", "2"))
+    UPLOAD_WRITE_QUEUE_SIZE = int(os.getenv("UPLOAD_WRITE_QUEUE_SIZE", "256"))
+
+    # Gravação das predições em lote (group commit)
+    DB_FLUSH_ROWS = int(os.getenv("DB_FLUSH_ROWS", "100"))
+    DB_FLUSH_INTERVAL_MS = float(os.getenv("DB_FLUSH_INTERVAL_MS", "50"))
+
+    # Endpoints /debug/profiler/ (profiler por amostragem); desligados por padrão
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+
+    @staticmethod
+    def get_model_artifact():
+        """Arquivo de pesos usado pelo backend selecionado"""
+        return {
+            "eager": Config.MODEL_PATH,
+            "torchscript": Config.TORCHSCRIPT_PATH,
+            "onnxruntime": Config.ONNX_PATH,
+            "int8": Config.QUANTIZED_MODEL_PATH,
+        }[Config.MODEL_BACKEND]
+
     @staticmethod
     def get_transform():
-        return transforms.Compose([
-            transforms.Resize(Config.IMAGE_SIZE),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=Config.MEAN, std=Config.STD)
-        ])
+        # Resize -> ToTensor -> Normalize fundidos em uma passada (ver preprocessing.py)
+        return FastTransform(Config.IMAGE_SIZE, Config.MEAN, Config.STD)
@@ -1,15 +1,80 @@
 import sqlite3
+import base64
 import datetime
-from typing import List, Dict, Any
+import logging
+import queue
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import Config
+from app.metrics import DB_FLUSH_ROWS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Sinaliza para a thread de escrita que deve gravar o que tiver e encerrar
+_STOP = object()
+
+# Faixas do histograma de confiança: [0.0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]
+CONFIDENCE_BINS = 10
+
+# Agregados por hora mantidos incrementalmente a cada predição inserida
+_STATS_BUCKET_SQL = "strftime('%Y-%m-%d %H:00', {ts})"
+_STATS_BIN_SQL = f"MIN(CAST({{conf}} * {CONFIDENCE_BINS} AS INTEGER), {CONFIDENCE_BINS - 1})"
 
 class Database:
-    def __init__(self, db_path: str = "predictions.db"):
+    """Persistência das predições em SQLite.
+
+    As leituras usam uma conexão de longa duração e as escritas são feitas por
+    uma thread dedicada que agrupa as linhas recebidas e grava em uma única
+    transação a cada ``flush_rows`` linhas ou ``flush_interval_ms`` ms. Com o
+    journal em modo WAL, leitores não bloqueiam o escritor e vice-versa.
+    """
+
+    def __init__(self, db_path: str = Config.DB_PATH,
+                 flush_rows: int = Config.DB_FLUSH_ROWS,
+                 flush_interval_ms: float = Config.DB_FLUSH_INTERVAL_MS):
         self.db_path = db_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
         self.init_db()
-    
+
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._run_writer, name="db-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Em WAL, NORMAL só faz fsync no checkpoint, e não a cada commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def init_db(self):
-        conn = sqlite3.connect(self.db_path)
+        """Cria o schema; seguro com vários workers iniciando ao mesmo tempo.
+
+        Tudo roda em uma única transação ``BEGIN IMMEDIATE``: o primeiro worker
+        a pegar o lock de escrita cria o trigger e popula os agregados, e os
+        demais só verificam o schema depois que ele termina, sem repetir o
+        backfill (o que contaria as predições duas vezes).
+        """
+        # isolation_level=None: a transação é controlada explicitamente abaixo
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_schema(cursor)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _create_schema(self, cursor: sqlite3.Cursor):
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS predictions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -19,28 +84,248 @@ class Database:
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        conn.commit()
-        conn.close()
-    
-    def save_prediction(self, filename: str, prediction: str, confidence: float):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # O rowid (id) faz parte de todo índice, então (timestamp, id) sai ordenado
         cursor.execute('''
-            INSERT INTO predictions (filename, prediction, confidence)
-            VALUES (?, ?, ?)
-        ''', (filename, prediction, confidence))
-        conn.commit()
-        conn.close()
-    
-    def get_recent_predictions(self, limit: int = 10) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+            CREATE INDEX IF NOT EXISTS idx_predictions_timestamp
+            ON predictions (timestamp)
+        ''')
         cursor.execute('''
-            SELECT * FROM predictions 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
-        rows = cursor.fetchall()
+            CREATE INDEX IF NOT EXISTS idx_predictions_prediction_timestamp
+            ON predictions (prediction, timestamp)
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_stats (
+                bucket TEXT NOT NULL,
+                prediction TEXT NOT NULL,
+                bin INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, prediction, bin)
+            ) WITHOUT ROWID
+        ''')
+
+        # Na primeira execução com o trigger, popula os agregados com o histórico existente
+        cursor.execute('''
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'trigger' AND name = 'trg_predictions_stats'
+        ''')
+        if cursor.fetchone() is None:
+            bucket = _STATS_BUCKET_SQL.format(ts="timestamp")
+            bin_ = _STATS_BIN_SQL.format(conf="confidence")
+            cursor.execute(f'''
+                INSERT INTO prediction_stats (bucket, prediction, bin, count)
+                SELECT {bucket}, prediction, {bin_}, COUNT(*)
+                FROM predictions
+                GROUP BY 1, 2, 3
+            ''')
+            bucket = _STATS_BUCKET_SQL.format(ts="NEW.timestamp")
+            bin_ = _STATS_BIN_SQL.format(conf="NEW.confidence")
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_predictions_stats AFTER INSERT ON predictions
+                BEGIN
+                    INSERT INTO prediction_stats (bucket, prediction, bin, count)
+                    VALUES ({bucket}, NEW.prediction, {bin_}, 1)
+                    ON CONFLICT (bucket, prediction, bin) DO UPDATE SET count = count + 1;
+                END
+            ''')
+    
+    def save_prediction(self, filename: str, prediction: str, confidence: float):
+        """Enfileira a predição para a próxima gravação em lote (não bloqueia)"""
+        # Mesmo formato do CURRENT_TIMESTAMP, capturado no momento da predição
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._queue.put((filename, prediction, confidence, timestamp))
+
+    @property
+    def queue_depth(self) -> int:
+        """Predições aguardando a próxima gravação"""
+        return self._queue.qsize()
+
+    def close(self):
+        """Grava as predições pendentes e encerra a thread de escrita"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._read_conn.close()
+
+    def get_recent_predictions(self, limit: int = 10, cursor: Optional[str] = None,
+                               prediction: Optional[str] = None,
+                               min_confidence: Optional[float] = None,
+                               max_confidence: Optional[float] = None
+                               ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Retorna uma página de predições (mais recentes primeiro) e o cursor da próxima.
+
+        A paginação é por keyset sobre (timestamp, id): cada página continua a
+        partir da última linha da anterior usando o índice, sem OFFSET.
+        """
+        sql, params = recent_predictions_query(limit + 1, cursor, prediction, min_confidence, max_confidence)
+        with self._read_lock:
+            db_cursor = self._read_conn.cursor()
+            db_cursor.row_factory = sqlite3.Row
+            db_cursor.execute(sql, params)
+            rows = [dict(row) for row in db_cursor.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+        return rows, next_cursor
+
+    def get_prediction_summary(self, granularity: str = "hour", since: Optional[str] = None,
+                               until: Optional[str] = None) -> Dict[str, Any]:
+        """Contagem por classe e histograma de confiança por período.
+
+        Lê apenas a tabela de agregados (uma linha por hora/classe/faixa), nunca
+        a tabela de predições.
+        """
+        # Os buckets são por hora ("YYYY-MM-DD HH:00"); por dia basta truncar a data
+        bucket_expr = "substr(bucket, 1, 10)" if granularity == "day" else "bucket"
+        conditions = []
+        params: List[Any] = []
+        for value, upper in ((since, False), (until, True)):
+            if value is not None:
+                operator, key = bucket_bound(value, upper)
+                conditions.append(f"bucket {operator} ?")
+                params.append(key)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._read_lock:
+            rows = self._read_conn.execute(f'''
+                SELECT {bucket_expr} AS period, prediction, bin, SUM(count)
+                FROM prediction_stats
+                {where}
+                GROUP BY period, prediction, bin
+                ORDER BY period, prediction, bin
+            ''', params).fetchall()
+
+        counts: Dict[str, int] = {}
+        histogram: Dict[Tuple[str, str], List[int]] = {}
+        for period, prediction, bin_, count in rows:
+            counts[prediction] = counts.get(prediction, 0) + count
+            histogram.setdefault((period, prediction), [0] * CONFIDENCE_BINS)[bin_] += count
+
+        return {
+            "total": sum(counts.values()),
+            "counts": counts,
+            "granularity": granularity,
+            "histogram": [
+                {"bucket": period, "prediction": prediction, "bins": bins}
+                for (period, prediction), bins in histogram.items()
+            ]
+        }
+
+    def _run_writer(self):
+        conn = self._connect()
+        pending: List[Tuple[str, str, float, str]] = []
+        deadline: Optional[float] = None
+
+        while True:
+            timeout = None if not pending else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(conn, pending)
+                break
+
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+
+            if pending and (len(pending) >= self.flush_rows or time.monotonic() >= deadline):
+                self._flush(conn, pending)
+                pending = []
+
         conn.close()
-        return [dict(row) for row in rows]
+
+    def _flush(self, conn: sqlite3.Connection, rows: List[Tuple[str, str, float, str]]):
+        """Grava um lote de predições em uma única transação.
+
+        Uma falha (ex.: banco bloqueado por outro processo) é tentada de novo
+        uma vez após ``flush_interval``; só então o lote é descartado.
+        """
+        if not rows:
+            return
+        for attempt in (1, 2):
+            try:
+                with STAGE_SECONDS.time(stage="db_write"), conn:
+                    conn.executemany('''
+                        INSERT INTO predictions (filename, prediction, confidence, timestamp)
+                        VALUES (?, ?, ?, ?)
+                    ''', rows)
+                DB_FLUSH_ROWS.observe(len(rows))
+                return
+            except sqlite3.Error as e:
+                if attempt == 1:
+                    logger.warning("Erro ao gravar %d predições, tentando novamente: %s", len(rows), e)
+                    time.sleep(self.flush_interval)
+                else:
+                    logger.error("Erro ao gravar %d predições; lote descartado: %s", len(rows), e)
+
+
+def recent_predictions_query(limit: int, cursor: Optional[str] = None, prediction: Optional[str] = None,
+                             min_confidence: Optional[float] = None,
+                             max_confidence: Optional[float] = None) -> Tuple[str, List[Any]]:
+    """SQL e parâmetros de uma página de ``get_recent_predictions``.
+
+    O cursor usa a comparação de row values ``(timestamp, id) < (?, ?)``, que o
+    SQLite resolve como busca no índice (SEARCH); a forma expandida com OR faria
+    o índice ser percorrido desde a linha mais recente até o cursor.
+    """
+    conditions = []
+    params: List[Any] = []
+    if prediction is not None:
+        conditions.append("prediction = ?")
+        params.append(prediction)
+    if min_confidence is not None:
+        conditions.append("confidence >= ?")
+        params.append(min_confidence)
+    if max_confidence is not None:
+        conditions.append("confidence <= ?")
+        params.append(max_confidence)
+    if cursor is not None:
+        last_timestamp, last_id = decode_cursor(cursor)
+        conditions.append("(timestamp, id) < (?, ?)")
+        params.extend([last_timestamp, last_id])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f'''
+        SELECT * FROM predictions
+        {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    '''
+    return sql, params + [limit]
+
+def bucket_bound(value: str, upper: bool) -> Tuple[str, str]:
+    """Converte um limite ``since``/``until`` em (operador, chave de bucket).
+
+    Só a data (``YYYY-MM-DD``) inclui o dia inteiro: como ``until`` ela vira
+    "antes do início do dia seguinte". Com hora, entra o bucket de hora que
+    contém o instante (horários com fuso são convertidos para UTC).
+    """
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            day = datetime.date.fromisoformat(value)
+            if upper:
+                return "<", (day + datetime.timedelta(days=1)).strftime("%Y-%m-%d 00:00")
+            return ">=", day.strftime("%Y-%m-%d 00:00")
+        moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Data inválida: {value!r} (use YYYY-MM-DD ou YYYY-MM-DD HH:MM)")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ("<=" if upper else ">="), moment.strftime("%Y-%m-%d %H:00")
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Cursor opaco para a paginação por keyset"""
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return timestamp, int(row_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
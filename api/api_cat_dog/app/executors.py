@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable
+
+import torch
+
+from app.config import Config
+
+
+class ExecutorSaturated(Exception):
+    """Fila do executor cheia: a requisição deve ser rejeitada com 503"""
+
+
+class BoundedExecutor:
+    """Pool de threads com fila limitada, usado a partir do event loop.
+
+    O contador de tarefas pendentes só é alterado dentro do event loop, por
+    isso não precisa de lock. Quando a fila enche, ``run`` falha na hora com
+    ``ExecutorSaturated`` em vez de acumular trabalho indefinidamente.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=thread_name_prefix)
+        self.max_pending = max_pending
+        self.pending = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Executa ``fn(*args)`` no pool sem bloquear o event loop"""
+        if self.saturated:
+            raise ExecutorSaturated("Servidor sobrecarregado, tente novamente em instantes")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class AdmissionGate:
+    """Limita o número de requisições em processamento simultâneo.
+
+    Uma requisição admitida ocupa no máximo um slot de cada pool por vez, então
+    com o mesmo limite os pools nunca rejeitam trabalho no meio de um request.
+    Cada item de um lote é admitido como uma requisição.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inflight = 0
+        self._waiters: deque = deque()
+
+    @contextmanager
+    def admit(self):
+        if self.inflight >= self.limit:
+            raise ExecutorSaturated("Servidor sobrecarregado, tente novamente em instantes")
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._wake_next()
+
+    @asynccontextmanager
+    async def admit_waiting(self):
+        """Como ``admit``, mas aguarda um slot livre em vez de rejeitar (itens de lote)"""
+        while self.inflight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Acordado e cancelado em seguida: repassa a vez para o próximo da fila
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_next()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        with self.admit():
+            yield
+
+    def _wake_next(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+
+def configure_torch_threads():
+    """Ajusta o paralelismo intra-op do PyTorch para o pool de inferência"""
+    torch.set_num_threads(Config.INFERENCE_THREADS)
+
+
+# Inferência: um único worker, o paralelismo vem das threads internas do PyTorch
+inference_pool = BoundedExecutor(max_workers=1,
+                                 max_pending=Config.MAX_PENDING_REQUESTS,
+                                 thread_name_prefix="inference")
+
+# Decode/encode de imagens e demais tarefas de I/O do request
+cpu_pool = BoundedExecutor(max_workers=Config.DECODE_WORKERS,
+                           max_pending=Config.MAX_PENDING_REQUESTS,
+                           thread_name_prefix="decode")
+
+# Gravação de uploads: uma única task alimenta este pool, que nunca satura
+writer_pool = BoundedExecutor(max_workers=1, max_pending=1, thread_name_prefix="upload-writer")
+
+request_gate = AdmissionGate(Config.MAX_PENDING_REQUESTS)
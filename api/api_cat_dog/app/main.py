@@ -1,16 +1,32 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import torch
-from PIL import Image
+import asyncio
 import io
+import json
 import os
-from typing import Dict, Any
+import time
+import zipfile
+from typing import Dict, Any, List, Optional, Tuple
 
-from app.models import load_model
+from app.models import load_model, get_model_version
 from app.config import Config
 from app.database import Database
+from app.batching import BatchScheduler
+from app.executors import (ExecutorSaturated, configure_torch_threads, cpu_pool,
+                           inference_pool, request_gate, writer_pool)
+from app.cache import PredictionCache
+from app.metrics import (CACHE_HIT_RATE, CACHE_LOOKUPS, DB_QUEUE_DEPTH, INFERENCE_QUEUE_DEPTH,
+                         INFLIGHT_REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, UPLOAD_QUEUE_DEPTH,
+                         render_metrics)
+from app.precision import resolve_dtype
+from app.preprocessing import open_image
+from app.profiler import profiler
+from app.storage import UploadStore
+from app.streaming import (NDJSONStreamingResponse, PackageError, StreamingMultipartReader, TarMember,
+                           expand_upload)
 
 app = FastAPI(title="CatDog Classifier API", version="1.0.0")
 
@@ -24,34 +40,64 @@ app.add_middleware(
 )
 
 # Cria diretório de uploads se não existir
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", StaticFiles(directory=Config.UPLOAD_DIR), name="uploads")
 
 # Carrega o modelo uma vez ao iniciar a aplicação
 model = None
+batcher = None
+prediction_cache = None
 transform = Config.get_transform()
 db = Database()
+upload_store = UploadStore()
 
 @app.on_event("startup")
 async def startup_event():
-    global model
+    global model, batcher, prediction_cache
     try:
+        configure_torch_threads()
         model = load_model()
+        prediction_cache = PredictionCache(get_model_version(), Config.CACHE_MAX_ENTRIES,
+                                           Config.CACHE_DB_PATH)
+        batcher = BatchScheduler(model)
+        batcher.start()
+        upload_store.start()
+        
+        # Valores lidos a cada coleta do /metrics
+        INFERENCE_QUEUE_DEPTH.set_function(lambda: batcher.queue_depth)
+        INFLIGHT_REQUESTS.set_function(lambda: request_gate.inflight)
+        UPLOAD_QUEUE_DEPTH.set_function(lambda: upload_store.queue_depth)
+        DB_QUEUE_DEPTH.set_function(lambda: db.queue_depth)
+        CACHE_HIT_RATE.set_function(lambda: prediction_cache.stats()["hit_rate"])
         print("✅ Modelo carregado com sucesso!")
     except Exception as e:
         print(f"❌ Erro ao carregar modelo: {e}")
         raise e
 
-def predict_image(image: Image.Image) -> Dict[str, Any]:
-    """Faz a predição em uma imagem"""
+@app.on_event("shutdown")
+async def shutdown_event():
+    profiler.stop()
+    if batcher is not None:
+        await batcher.stop()
+    await upload_store.stop()
+    db.close()
+    inference_pool.shutdown()
+    cpu_pool.shutdown()
+    writer_pool.shutdown()
+
+def decode_image(contents: bytes) -> Tuple[str, torch.Tensor]:
+    """Decodifica os bytes recebidos e aplica as transformações (executa no cpu_pool)"""
+    with STAGE_SECONDS.time(stage="decode"):
+        image = open_image(io.BytesIO(contents), Config.IMAGE_SIZE)
+        image.load()
+    with STAGE_SECONDS.time(stage="transform"):
+        return image.format, transform(image)
+
+async def predict_image(image_tensor: torch.Tensor) -> Dict[str, Any]:
+    """Faz a predição em uma imagem já transformada"""
     try:
-        # Aplica as transformações
-        image_tensor = transform(image).unsqueeze(0).to(Config.DEVICE)
-        
-        # Faz a predição
-        with torch.no_grad():
-            output = model(image_tensor)
-            confidence = output.item()
+        # Faz a predição (agrupada com outras requisições concorrentes)
+        confidence = await batcher.submit(image_tensor)
         
         # Determina a classe baseado no threshold
         if confidence > Config.THRESHOLD:
@@ -70,6 +116,8 @@ def predict_image(image: Image.Image) -> Dict[str, Any]:
             "raw_output": round(confidence, 4)
         }
         
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na predição: {str(e)}")
 
@@ -80,38 +128,191 @@ async def predict(file: UploadFile = File(...)):
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Arquivo deve ser uma imagem")
     
+    start = time.perf_counter()
+    status = 500
     try:
-        # Lê a imagem
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('RGB')
-        
-        # Faz a predição
-        result = predict_image(image)
+        with request_gate.admit():
+            with STAGE_SECONDS.time(stage="upload_read"):
+                contents = await file.read()
+            response = JSONResponse(content=await process_upload(contents))
+            status = response.status_code
+            return response
         
-        # Salva a imagem no diretório de uploads
-        filename = f"{os.urandom(8).hex()}_{file.filename}"
-        file_path = os.path.join("uploads", filename)
-        image.save(file_path)
+    except ExecutorSaturated as e:
+        status = 503
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao processar imagem: {str(e)}")
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/predict/", status=status)
+
+async def process_upload(contents: bytes) -> Dict[str, Any]:
+    """Decodifica, classifica e registra uma imagem enviada"""
+    # Uploads repetidos reaproveitam a predição e o arquivo já salvos
+    with STAGE_SECONDS.time(stage="cache_lookup"):
+        digest, result = await cpu_pool.run(prediction_cache.lookup, contents)
+    CACHE_LOOKUPS.inc(result="hit" if result is not None else "miss")
+    
+    if result is not None:
+        filename = result["filename"]
+    else:
+        # Decodifica a imagem fora do event loop
+        image_format, image_tensor = await cpu_pool.run(decode_image, contents)
         
-        # Salva no banco de dados
-        db.save_prediction(filename, result["prediction"], result["confidence"])
+        # Faz a predição (inclui a espera pelo lote)
+        with STAGE_SECONDS.time(stage="inference"):
+            result = await predict_image(image_tensor)
         
-        return JSONResponse(content={
-            "filename": filename,
-            "prediction": result["prediction"],
-            "confidence": result["confidence"],
-            "message": get_prediction_message(result["prediction"]),
-            "image_url": f"/uploads/{filename}"
-        })
+        # Agenda a gravação dos bytes originais, endereçados pelo hash do conteúdo
+        with STAGE_SECONDS.time(stage="image_save"):
+            filename = await upload_store.save(digest, image_format, contents)
         
+        await cpu_pool.run(prediction_cache.put, digest, {"filename": filename, **result})
+    
+    # Registra no banco de dados (gravado em lote pela thread de escrita)
+    with STAGE_SECONDS.time(stage="db_enqueue"):
+        db.save_prediction(filename, result["prediction"], result["confidence"])
+    
+    return {
+        "filename": filename,
+        "prediction": result["prediction"],
+        "confidence": result["confidence"],
+        "message": get_prediction_message(result["prediction"]),
+        "image_url": f"/uploads/{filename}"
+    }
+
+@app.post("/predict/batch/")
+async def predict_batch(request: Request):
+    """Predição em lote: recebe vários arquivos (ou .zip/.tar) e devolve NDJSON à medida que processa"""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Envie os arquivos como multipart/form-data")
+    
+    try:
+        reader = StreamingMultipartReader(content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return NDJSONStreamingResponse(stream_batch_predictions(request, reader))
+
+async def iter_uploaded_parts(request: Request, reader: StreamingMultipartReader):
+    """Entrega (nome, bytes) de cada arquivo assim que ele termina de chegar no upload.
+    
+    Membros de .tar (``TarMember``) saem enquanto o pacote ainda está chegando,
+    e a leitura do upload espera quando a extração fica para trás.
+    """
+    async for chunk in request.stream():
+        for part in reader.feed(chunk):
+            yield part
+        async for part in reader.pending():
+            yield part
+    for part in reader.close():
+        yield part
+    async for part in reader.pending():
+        yield part
+
+async def expand_part(filename: str, data: bytes) -> List[Tuple[str, bytes]]:
+    """Expande um arquivo do lote (um .zip vira seus membros) ocupando um slot de admissão"""
+    async with request_gate.admit_waiting():
+        return await cpu_pool.run(expand_upload, filename, data)
+
+async def classify_batch_item(index: int, source: str, contents: bytes) -> Dict[str, Any]:
+    """Processa um item do lote; erros viram uma linha de erro em vez de abortar o lote.
+    
+    Cada item passa pelo ``request_gate`` como uma requisição, aguardando um
+    slot livre, para que os lotes não ocupem os pools dos ``/predict/`` já admitidos.
+    """
+    try:
+        async with request_gate.admit_waiting():
+            return {"index": index, "source": source, **await process_upload(contents)}
+    except HTTPException as e:
+        return {"index": index, "source": source, "error": e.detail}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar imagem: {str(e)}")
+        return {"index": index, "source": source, "error": str(e)}
+
+async def stream_batch_predictions(request: Request, reader: StreamingMultipartReader):
+    """Sobrepõe upload e inferência, emitindo cada resultado como uma linha NDJSON"""
+    pending = set()
+    index = 0
+    try:
+        try:
+            async for part in iter_uploaded_parts(request, reader):
+                if isinstance(part, PackageError):
+                    yield json.dumps({"source": part.source, "error": part.error}, ensure_ascii=False) + "\n"
+                    continue
+                if isinstance(part, TarMember):
+                    items = [part]
+                else:
+                    filename, data = part
+                    try:
+                        items = await expand_part(filename, data)
+                    except ExecutorSaturated as e:
+                        yield json.dumps({"source": filename, "error": str(e)}, ensure_ascii=False) + "\n"
+                        continue
+                    except zipfile.BadZipFile as e:
+                        yield json.dumps({"source": filename, "error": f"Pacote inválido: {e}"},
+                                         ensure_ascii=False) + "\n"
+                        continue
+                
+                for source, contents in items:
+                    pending.add(asyncio.create_task(classify_batch_item(index, source, contents)))
+                    index += 1
+                    
+                    # Backpressure: com muitos itens em voo, para de ler o upload até algum terminar
+                    if len(pending) >= Config.BATCH_MAX_INFLIGHT:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        done = {task for task in pending if task.done()}
+                        pending -= done
+                    for task in done:
+                        yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+        except ValueError as e:
+            # Multipart malformado ou arquivo grande demais: reporta e encerra o lote
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+        
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+    finally:
+        reader.abort()
+        for task in pending:
+            task.cancel()
 
 @app.get("/predictions/recent/")
-async def get_recent_predictions(limit: int = 10):
-    """Retorna as predições recentes"""
-    predictions = db.get_recent_predictions(limit)
-    return {"predictions": predictions}
+async def get_recent_predictions(
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = None,
+    prediction: Optional[str] = Query(None, pattern="^(cat|dog|uncertain)$"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    max_confidence: Optional[float] = Query(None, ge=0, le=1)
+):
+    """Retorna as predições recentes; use ``next_cursor`` para buscar a próxima página"""
+    try:
+        predictions, next_cursor = await cpu_pool.run(
+            db.get_recent_predictions, limit, cursor, prediction, min_confidence, max_confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"predictions": predictions, "next_cursor": next_cursor}
+
+@app.get("/predictions/summary/")
+async def get_predictions_summary(
+    granularity: str = Query("hour", pattern="^(hour|day)$"),
+    since: Optional[str] = Query(None, description="Início do período, ex.: 2025-01-31 ou 2025-01-31 08:00"),
+    until: Optional[str] = Query(None, description="Fim do período (inclusive), ex.: 2025-01-31 ou 2025-01-31 23:00")
+):
+    """Contagem por classe e histograma de confiança por hora ou dia"""
+    try:
+        return await cpu_pool.run(db.get_prediction_summary, granularity, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.get("/health/")
 async def health_check():
@@ -119,9 +320,49 @@ async def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None,
-        "device": str(Config.DEVICE)
+        "device": str(Config.DEVICE),
+        "model_backend": Config.MODEL_BACKEND,
+        "precision": str(resolve_dtype() or torch.float32).replace("torch.", ""),
+        "channels_last": Config.CHANNELS_LAST,
+        "batch_max_size": Config.BATCH_MAX_SIZE,
+        "batch_max_wait_ms": Config.BATCH_MAX_WAIT_MS,
+        "inflight_requests": request_gate.inflight,
+        "inference_queue_depth": batcher.queue_depth if batcher is not None else 0,
+        "cache": prediction_cache.stats() if prediction_cache is not None else None
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def require_profiler():
+    if not Config.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler desabilitado (defina PROFILER_ENABLED=1)")
+
+@app.get("/debug/profiler/")
+async def profiler_status():
+    """Estado do profiler por amostragem"""
+    require_profiler()
+    return profiler.status()
+
+@app.post("/debug/profiler/start")
+async def profiler_start(interval_ms: float = Query(5.0, ge=1, le=1000)):
+    """Começa a amostrar as pilhas de todas as threads"""
+    require_profiler()
+    try:
+        profiler.start(interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+@app.post("/debug/profiler/stop", response_class=PlainTextResponse)
+async def profiler_stop():
+    """Para a amostragem e devolve as pilhas no formato collapsed (flamegraph.pl/speedscope)"""
+    require_profiler()
+    profiler.stop()
+    return PlainTextResponse(profiler.collapsed())
+
 def get_prediction_message(prediction: str) -> str:
     """Retorna mensagem amigável baseada na predição"""
     messages = {
@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Limites (em segundos) dos histogramas de latência: de 0,5 ms a 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    """Base das métricas: guarda uma série por combinação de labels.
+
+    Todas as métricas aceitam ser atualizadas de qualquer thread (event loop,
+    pools de decode/inferência e thread de escrita do banco).
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values]
+
+
+class Gauge(_Metric):
+    """Valor lido no momento da coleta, a partir de uma função (ex.: profundidade de fila)"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self._function = function
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is None:
+            return []
+        return [f"{self.name} {_format_value(self._function())}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Por série: (contagem por faixa, [soma das observações])
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Mede a duração do bloco em segundos"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Todas as métricas no formato de texto do Prometheus"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# Métricas da API
+STAGE_SECONDS = Histogram(
+    "catdog_stage_seconds",
+    "Duração de cada etapa do processamento de uma imagem",
+    labelnames=("stage",))
+REQUEST_SECONDS = Histogram(
+    "catdog_request_seconds",
+    "Duração total das requisições por endpoint",
+    labelnames=("endpoint", "status"))
+BATCH_SIZE = Histogram(
+    "catdog_inference_batch_size",
+    "Imagens por forward pass do micro-batching",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+DB_FLUSH_ROWS = Histogram(
+    "catdog_db_flush_rows",
+    "Predições gravadas por transação no SQLite",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500))
+CACHE_LOOKUPS = Counter(
+    "catdog_cache_lookups_total",
+    "Consultas ao cache de predições por resultado",
+    labelnames=("result",))
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "catdog_inference_queue_depth",
+    "Imagens aguardando o próximo lote de inferência")
+INFLIGHT_REQUESTS = Gauge(
+    "catdog_inflight_requests",
+    "Requisições admitidas em processamento")
+UPLOAD_QUEUE_DEPTH = Gauge(
+    "catdog_upload_write_queue_depth",
+    "Uploads aguardando gravação em disco")
+DB_QUEUE_DEPTH = Gauge(
+    "catdog_db_write_queue_depth",
+    "Predições aguardando gravação no SQLite")
+CACHE_HIT_RATE = Gauge(
+    "catdog_cache_hit_rate",
+    "Fração das consultas ao cache de predições que encontraram resultado")
@@ -1,7 +1,9 @@
+import hashlib
 import torch
 import torch.nn as nn
 from torchvision import models
 from app.config import Config
+from app.precision import resolve_dtype
 
 class CatDogClassifier(nn.Module):
     def __init__(self):
@@ -24,10 +26,66 @@ class CatDogClassifier(nn.Module):
         x = self.model(x)
         return self.sigmoid(x)
 
+class OnnxRuntimeModel:
+    """Adapta uma sessão do ONNX Runtime à interface do modelo PyTorch (tensor -> tensor)"""
+
+    def __init__(self, model_path: str):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("MODEL_BACKEND=onnxruntime requer o pacote onnxruntime instalado")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = Config.INFERENCE_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        output = self.session.run(None, {self.input_name: x.cpu().numpy()})[0]
+        return torch.from_numpy(output)
+
+    def eval(self):
+        return self
+
+
+# Seleciona os kernels INT8 disponíveis na CPU (x86/fbgemm em Intel/AMD, qnnpack em ARM)
+def select_quantized_engine():
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("Nenhum backend de quantização disponível nesta CPU")
+
+
 # Função para carregar o modelo
 def load_model():
-    model = CatDogClassifier()
-    model.load_state_dict(torch.load(Config.MODEL_PATH, map_location=Config.DEVICE))
+    if Config.MODEL_BACKEND == "eager":
+        model = CatDogClassifier()
+        model.load_state_dict(torch.load(Config.MODEL_PATH, map_location=Config.DEVICE))
+    elif Config.MODEL_BACKEND == "torchscript":
+        model = torch.jit.load(Config.TORCHSCRIPT_PATH, map_location=Config.DEVICE)
+    elif Config.MODEL_BACKEND == "int8":
+        # Modelo quantizado (TorchScript gerado por cat_dog/quantize.py)
+        select_quantized_engine()
+        model = torch.jit.load(Config.QUANTIZED_MODEL_PATH, map_location="cpu")
+    elif Config.MODEL_BACKEND == "onnxruntime":
+        return OnnxRuntimeModel(Config.ONNX_PATH)
+    else:
+        raise ValueError(f"MODEL_BACKEND desconhecido: {Config.MODEL_BACKEND}")
+
     model.to(Config.DEVICE)
+    if Config.CHANNELS_LAST and Config.MODEL_BACKEND == "eager":
+        model.to(memory_format=torch.channels_last)
     model.eval()
     return model
+
+
+# Identifica os pesos carregados; usado para invalidar o cache de predições
+def get_model_version() -> str:
+    # A precisão entra no hash porque bf16/fp16 alteram levemente as probabilidades
+    digest = hashlib.sha256(f"{Config.MODEL_BACKEND}:{resolve_dtype()}".encode())
+    with open(Config.get_model_artifact(), "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
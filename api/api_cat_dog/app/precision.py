@@ -0,0 +1,43 @@
+import contextlib
+from typing import Optional
+
+import torch
+
+from app.config import Config
+
+
+def cpu_supports_bf16() -> bool:
+    """Indica se o oneDNN tem kernels bfloat16 nativos nesta CPU (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve_dtype() -> Optional[torch.dtype]:
+    """Converte Config.PRECISION no dtype do autocast (None = FP32).
+
+    Só o backend eager usa precisão mista; os demais já trazem a precisão
+    definida no próprio artefato (TorchScript congelado, ONNX ou INT8).
+    """
+    mode = Config.PRECISION
+    if Config.MODEL_BACKEND != "eager" or mode == "fp32":
+        return None
+    if mode == "auto":
+        if Config.DEVICE.type == "cuda":
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return torch.bfloat16 if cpu_supports_bf16() else None
+    if mode == "bf16":
+        return torch.bfloat16
+    if mode == "fp16":
+        if Config.DEVICE.type != "cuda":
+            raise ValueError("PRECISION=fp16 requer CUDA; use bf16 na CPU")
+        return torch.float16
+    raise ValueError(f"PRECISION desconhecida: {mode}")
+
+
+def autocast(dtype: Optional[torch.dtype]):
+    """Contexto de autocast para o dtype; não faz nada em FP32"""
+    if dtype is None:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=Config.DEVICE.type, dtype=dtype)
@@ -0,0 +1,64 @@
+import numpy as np
+import torch
+from PIL import Image
+
+
+def _as_hw(size):
+    return (size, size) if isinstance(size, int) else tuple(size)
+
+
+def open_image(source, size) -> Image.Image:
+    """Abre a imagem em RGB, decodificando JPEGs já em escala reduzida.
+
+    O ``draft`` faz o libjpeg reduzir a imagem em 1/2, 1/4 ou 1/8 no domínio
+    DCT, mantendo os dois lados >= tamanho final; fotos de vários megapixels
+    não são decodificadas por inteiro só para virar 224x224.
+    """
+    height, width = _as_hw(size)
+    image = Image.open(source)
+    if image.format == "JPEG":
+        image.draft("RGB", (width, height))
+    return image
+
+
+class FastTransform:
+    """Resize + ToTensor + Normalize em uma única passada.
+
+    Equivale a ``Compose([Resize(size), ToTensor(), Normalize(mean, std)])``,
+    mas a divisão por 255 e a normalização viram uma única multiplicação e
+    soma, escritas direto no tensor de saída.
+    """
+
+    def __init__(self, size, mean, std):
+        self.height, self.width = _as_hw(size)
+        std = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        mean = torch.tensor(mean, dtype=torch.float32).view(3, 1, 1)
+        # (x / 255 - mean) / std == x * scale + bias
+        self.scale = 1.0 / (255.0 * std)
+        self.bias = -mean / std
+
+    def __call__(self, image: Image.Image, out: torch.Tensor = None) -> torch.Tensor:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != (self.width, self.height):
+            image = image.resize((self.width, self.height), Image.BILINEAR)
+
+        pixels = torch.from_numpy(np.array(image, dtype=np.uint8)).permute(2, 0, 1)
+        if out is None:
+            out = torch.empty((3, self.height, self.width), dtype=torch.float32)
+        torch.mul(pixels, self.scale, out=out)
+        return out.add_(self.bias)
+
+
+class BatchBuffer:
+    """Tensor (N, 3, H, W) pré-alocado e reutilizado a cada lote"""
+
+    def __init__(self, max_batch_size: int, size):
+        height, width = _as_hw(size)
+        self.tensor = torch.empty((max_batch_size, 3, height, width), dtype=torch.float32)
+
+    def stack(self, tensors) -> torch.Tensor:
+        """Copia as amostras para o buffer e retorna a visão (n, 3, H, W) preenchida"""
+        batch = self.tensor[:len(tensors)]
+        torch.stack(tensors, out=batch)
+        return batch
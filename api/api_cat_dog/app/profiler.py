@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+
+class SamplingProfiler:
+    """Profiler por amostragem das pilhas de todas as threads.
+
+    Uma thread daemon lê ``sys._current_frames()`` a cada ``interval_ms`` e
+    conta as pilhas vistas. O resultado sai no formato "collapsed stacks"
+    (``func;func;func contagem``), aceito por flamegraph.pl e speedscope. O custo
+    é proporcional à frequência de amostragem e não ao volume de requisições,
+    por isso pode ser ligado em produção por alguns segundos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.interval = 0.0
+        self.samples = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0):
+        """Zera as amostras anteriores e começa a amostrar"""
+        if self.running:
+            raise RuntimeError("O profiler já está em execução")
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "started_at": self.started_at
+        }
+
+    def collapsed(self) -> str:
+        """Pilhas amostradas no formato collapsed, da mais frequente para a menos"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                sampled.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from typing import Optional, Set
+
+from app.config import Config
+from app.executors import BoundedExecutor, writer_pool
+from app.metrics import STAGE_SECONDS
+
+# Extensão usada ao salvar, a partir do formato detectado pelo PIL
+FORMAT_EXTENSIONS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "GIF": ".gif",
+    "BMP": ".bmp",
+    "WEBP": ".webp",
+    "TIFF": ".tif",
+}
+
+
+class UploadStore:
+    """Armazena os uploads pelo hash do conteúdo, sem re-encode.
+
+    Os bytes originais são gravados em ``<root>/ab/cd/<hash><ext>``; os
+    subdiretórios evitam milhões de arquivos numa única pasta. As gravações
+    passam por uma fila consumida por uma task em segundo plano, então o
+    request não espera o disco. Conteúdo repetido é gravado uma única vez.
+    """
+
+    def __init__(self, root: str = Config.UPLOAD_DIR, shard_depth: int = Config.UPLOAD_SHARD_DEPTH,
+                 queue_size: int = Config.UPLOAD_WRITE_QUEUE_SIZE, executor: BoundedExecutor = writer_pool):
+        self.root = root
+        self.shard_depth = shard_depth
+        self.queue_size = queue_size
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+
+    def relative_path(self, digest: str, image_format: Optional[str]) -> str:
+        """Caminho relativo (também usado na URL /uploads/...) para um conteúdo"""
+        shards = [digest[i * 2:(i + 1) * 2] for i in range(self.shard_depth)]
+        extension = FORMAT_EXTENSIONS.get(image_format or "", "")
+        return "/".join(shards + [digest + extension])
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Inicia a task de gravação no event loop atual"""
+        os.makedirs(self.root, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Aguarda as gravações pendentes e encerra a task"""
+        if self._writer is None:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    async def save(self, digest: str, image_format: Optional[str], contents: bytes) -> str:
+        """Agenda a gravação do upload e retorna seu caminho relativo"""
+        relative_path = self.relative_path(digest, image_format)
+        if relative_path not in self._pending:
+            self._pending.add(relative_path)
+            # Com a fila cheia o request espera aqui, limitando a memória em uso
+            await self._queue.put((relative_path, contents))
+        return relative_path
+
+    def _write(self, relative_path: str, contents: bytes):
+        path = os.path.join(self.root, *relative_path.split("/"))
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Grava em arquivo temporário e renomeia: quem lê nunca vê arquivo parcial
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with STAGE_SECONDS.time(stage="image_write"):
+            with open(tmp_path, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_path, path)
+
+    async def _run(self):
+        while True:
+            relative_path, contents = await self._queue.get()
+            try:
+                await self.executor.run(self._write, relative_path, contents)
+            except Exception as e:
+                print(f"❌ Erro ao gravar upload {relative_path}: {e}")
+            finally:
+                self._pending.discard(relative_path)
+                self._queue.task_done()
@@ -0,0 +1,302 @@
+import asyncio
+import io
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from typing import AsyncIterator, Deque, List, NamedTuple, Optional, Tuple, Union
+
+import anyio
+from fastapi.responses import StreamingResponse
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import Config
+
+ZIP_EXTENSIONS = ('.zip',)
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+# Bytes de um .tar recebidos e ainda não lidos pela thread de extração; acima disso o upload para de ser lido
+TAR_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+class TarMember(NamedTuple):
+    """Membro de um .tar do lote, já extraído (``source`` é ``pacote.tar/caminho/do/membro``)"""
+    source: str
+    data: bytes
+
+
+class PackageError(NamedTuple):
+    """Falha ao extrair um pacote do lote ou um de seus membros"""
+    source: str
+    error: str
+
+
+# Itens entregues pelo leitor: arquivo completo (nome, bytes), membro de .tar ou erro de pacote
+UploadedPart = Union[Tuple[str, bytes], TarMember, PackageError]
+
+
+class _Pipe:
+    """Buffer entre o event loop, que escreve os pedaços do .tar, e a thread que os lê"""
+
+    def __init__(self, on_read):
+        self._buffer = bytearray()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._on_read = on_read
+
+    @property
+    def buffered(self) -> int:
+        with self._cond:
+            return len(self._buffer)
+
+    def write(self, data: bytes):
+        with self._cond:
+            if not self._closed:
+                self._buffer += data
+                self._cond.notify()
+
+    def close(self, discard: bool = False):
+        """Fim dos dados; com ``discard`` o que ainda não foi lido é descartado"""
+        with self._cond:
+            self._closed = True
+            if discard:
+                self._buffer.clear()
+            self._cond.notify()
+
+    def read(self, size: int = -1) -> bytes:
+        # Como em um arquivo, só devolve menos que ``size`` bytes no fim dos dados
+        with self._cond:
+            while not self._closed and (size < 0 or len(self._buffer) < size):
+                self._cond.wait()
+            size = len(self._buffer) if size < 0 else size
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self._on_read()
+        return data
+
+
+class _TarExtractor:
+    """Extrai um .tar com ``tarfile.open(mode="r|*")`` em uma thread, enquanto a parte ainda chega.
+
+    Os membros extraídos (e os erros) vão para ``ready`` no event loop, à
+    medida que são lidos; ``done`` indica que a thread terminou.
+    """
+
+    def __init__(self, filename: str, max_member_bytes: int, progress: asyncio.Event):
+        self.filename = filename
+        self.max_member_bytes = max_member_bytes
+        self.ready: List[Union[TarMember, PackageError]] = []
+        self.done = False
+        self._loop = asyncio.get_running_loop()
+        self._progress = progress
+        self.pipe = _Pipe(self._notify_progress)
+        self._thread = threading.Thread(target=self._run, name="tar-extract", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with tarfile.open(fileobj=self.pipe, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    source = f"{self.filename}/{member.name}"
+                    if member.size > self.max_member_bytes:
+                        self._emit(PackageError(source, f"Arquivo excede o limite de {self.max_member_bytes} bytes"))
+                        continue
+                    self._emit(TarMember(source, archive.extractfile(member).read()))
+        except Exception as e:
+            # tarfile, gzip, bz2 e lzma levantam tipos diferentes para pacotes corrompidos
+            self._emit(PackageError(self.filename, f"Pacote inválido: {e}"))
+        finally:
+            # O restante da parte (ou tudo, se o pacote falhou) é descartado sem segurar o upload
+            self.pipe.close(discard=True)
+            self._emit(None)
+
+    def _emit(self, item):
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, item)
+        except RuntimeError:
+            pass  # event loop já encerrado
+
+    def _deliver(self, item):
+        if item is None:
+            self.done = True
+        else:
+            self.ready.append(item)
+        self._progress.set()
+
+    def _notify_progress(self):
+        if self.pipe.buffered <= TAR_BUFFER_BYTES:
+            try:
+                self._loop.call_soon_threadsafe(self._progress.set)
+            except RuntimeError:
+                pass
+
+
+class StreamingMultipartReader:
+    """Lê um corpo multipart/form-data de forma incremental.
+
+    Diferente do ``UploadFile`` do FastAPI, que só entrega o formulário depois
+    que o upload inteiro terminou, cada arquivo é devolvido por ``feed`` assim
+    que sua parte termina de chegar. Arquivos comuns e .zip (que precisa do
+    diretório central, no fim do arquivo) ficam inteiros em memória, até
+    ``max_part_bytes``; um .tar é extraído em streaming e seus membros saem
+    por ``feed``/``pending`` enquanto o pacote ainda está chegando. Os itens
+    saem na ordem do upload: arquivos enviados depois de um .tar esperam o
+    fim da extração dele.
+    """
+
+    def __init__(self, content_type: str, max_part_bytes: int = Config.BATCH_MAX_PART_BYTES):
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise ValueError("Boundary ausente no multipart/form-data")
+
+        self.max_part_bytes = max_part_bytes
+        # Partes na ordem do upload: (nome, bytes) completos ou o extrator de um .tar
+        self._parts: Deque[Union[Tuple[str, bytes], _TarExtractor]] = deque()
+        self._held_bytes = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._filename: Optional[str] = None
+        self._data = bytearray()
+        self._tar: Optional[_TarExtractor] = None
+        self._closed = False
+        # Sinalizado pelas threads de extração a cada membro extraído ou buffer esvaziado
+        self._progress = asyncio.Event()
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def feed(self, chunk: bytes) -> List[UploadedPart]:
+        """Processa um pedaço do corpo e retorna os arquivos completados nele (e membros de .tar já extraídos)"""
+        self._parser.write(chunk)
+        return self._take_completed()
+
+    def close(self) -> List[UploadedPart]:
+        """Finaliza o parser e retorna os arquivos que ainda estavam pendentes"""
+        self._parser.finalize()
+        self._closed = True
+        return self._take_completed()
+
+    async def pending(self) -> AsyncIterator[UploadedPart]:
+        """Aguarda a extração dos .tar, entregando os itens que ficarem prontos.
+
+        Antes do ``close``, só espera enquanto um .tar tem mais de
+        ``TAR_BUFFER_BYTES`` por ler ou há mais que isso em arquivos esperando
+        um .tar terminar (backpressure sobre o upload); depois dele, até todas
+        as extrações terminarem.
+        """
+        while True:
+            for part in self._take_completed():
+                yield part
+            extractors = [part for part in self._parts if isinstance(part, _TarExtractor)]
+            if not extractors:
+                return
+            if (not self._closed and self._held_bytes <= TAR_BUFFER_BYTES
+                    and all(extractor.pipe.buffered <= TAR_BUFFER_BYTES for extractor in extractors)):
+                return
+            self._progress.clear()
+            await self._progress.wait()
+
+    def abort(self):
+        """Interrompe as extrações em andamento (upload abandonado)"""
+        for part in self._parts:
+            if isinstance(part, _TarExtractor):
+                part.pipe.close(discard=True)
+
+    def _take_completed(self) -> List[UploadedPart]:
+        completed = []
+        while self._parts:
+            head = self._parts[0]
+            if isinstance(head, _TarExtractor):
+                completed.extend(head.ready)
+                head.ready.clear()
+                if not head.done:
+                    break
+            else:
+                self._held_bytes -= len(head[1])
+                completed.append(head)
+            self._parts.popleft()
+        return completed
+
+    def _on_part_begin(self):
+        self._disposition = b""
+        self._filename = None
+        self._data = bytearray()
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        # Campos de formulário comuns (sem filename) são ignorados
+        if b"filename" in options:
+            self._filename = options[b"filename"].decode("utf-8", errors="replace")
+        if self._filename is not None and self._filename.lower().endswith(TAR_EXTENSIONS):
+            self._tar = _TarExtractor(self._filename, self.max_part_bytes, self._progress)
+            self._parts.append(self._tar)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._tar is not None:
+            self._tar.pipe.write(data[start:end])
+            return
+        if self._filename is None:
+            return
+        self._data += data[start:end]
+        if len(self._data) > self.max_part_bytes:
+            raise ValueError(f"Arquivo excede o limite de {self.max_part_bytes} bytes")
+
+    def _on_part_end(self):
+        if self._tar is not None:
+            self._tar.pipe.close()
+            self._tar = None
+        elif self._filename is not None:
+            self._parts.append((self._filename, bytes(self._data)))
+            self._held_bytes += len(self._data)
+        self._data = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+
+def expand_upload(filename: str, data: bytes) -> List[Tuple[str, bytes]]:
+    """Expande um .zip em seus membros; outros arquivos passam direto (.tar já chega extraído do leitor).
+
+    Cada item vem com o nome de origem: o nome do arquivo enviado ou
+    ``arquivo.zip/caminho/do/membro`` para membros de um pacote.
+    """
+    if filename.lower().endswith(ZIP_EXTENSIONS):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return [(f"{filename}/{info.filename}", archive.read(info))
+                    for info in archive.infolist() if not info.is_dir()]
+
+    return [(filename, data)]
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse que não disputa o canal ``receive`` com o gerador.
+
+    A resposta começa a ser enviada enquanto o corpo da requisição ainda está
+    sendo lido pelo próprio gerador; o ``listen_for_disconnect`` padrão
+    consumiria esses pedaços do corpo. A desconexão do cliente continua sendo
+    detectada pelo ``request.stream()``.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def listen_for_disconnect(self, receive):
+        await anyio.sleep_forever()
@@ -0,0 +1 @@
+"""Benchmarks do modelo, do pré-processamento e da API (veja ``python -m benchmarks --help``)."""
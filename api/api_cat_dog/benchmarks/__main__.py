@@ -0,0 +1,367 @@
+import argparse
+import datetime
+import http.client
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.config import Config
+from app.executors import configure_torch_threads
+from app.models import load_model
+from app.precision import autocast, resolve_dtype
+from app.preprocessing import open_image
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(API_DIR, "benchmarks", "results")
+TEST_IMAGES = [os.path.join(API_DIR, "gato_teste.png"), os.path.join(API_DIR, "cachorro_teste.png")]
+
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+DEFAULT_IMAGE_SIZES = ["320x240", "640x480", "1280x720", "1920x1080", "4000x3000"]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/média/máximo em milissegundos"""
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Contexto necessário para comparar resultados entre commits e máquinas"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "device": str(Config.DEVICE),
+        "model_backend": Config.MODEL_BACKEND,
+        "precision": Config.PRECISION,
+        "channels_last": Config.CHANNELS_LAST,
+        "inference_threads": Config.INFERENCE_THREADS,
+    }
+
+
+# (a) Throughput do modelo por tamanho de lote
+
+def bench_model(batch_sizes: List[int], iterations: int, warmup: int) -> List[Dict[str, Any]]:
+    configure_torch_threads()
+    model = load_model()
+    dtype = resolve_dtype()
+    generator = torch.Generator().manual_seed(0)
+    results = []
+
+    for batch_size in batch_sizes:
+        inputs = torch.randn((batch_size, 3, *Config.IMAGE_SIZE), generator=generator).to(Config.DEVICE)
+        if Config.CHANNELS_LAST:
+            inputs = inputs.contiguous(memory_format=torch.channels_last)
+
+        timings = []
+        with torch.no_grad(), autocast(dtype):
+            for i in range(warmup + iterations):
+                start = time.perf_counter()
+                model(inputs)
+                if Config.DEVICE.type == "cuda":
+                    torch.cuda.synchronize()
+                if i >= warmup:
+                    timings.append(time.perf_counter() - start)
+
+        median = statistics.median(timings)
+        results.append({
+            "batch_size": batch_size,
+            "images_per_s": round(batch_size / median, 2),
+            **percentiles(timings),
+        })
+        print(f"  batch {batch_size:>3}: {batch_size / median:8.1f} img/s  (p50 {median * 1000:.2f} ms)")
+    return results
+
+
+# (b) Throughput do pré-processamento (decode + resize + normalize) por tamanho de imagem
+
+def synthetic_image(width: int, height: int, image_format: str) -> bytes:
+    """Imagem determinística com gradiente e ruído, comprimida no formato pedido"""
+    rng = np.random.default_rng(width * height)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, image_format, quality=90)
+    return buffer.getvalue()
+
+
+def bench_preprocessing(image_sizes: List[str], iterations: int, warmup: int) -> List[Dict[str, Any]]:
+    transform = Config.get_transform()
+    results = []
+    for size in image_sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        for image_format in ("JPEG", "PNG"):
+            contents = synthetic_image(width, height, image_format)
+            timings = []
+            for i in range(warmup + iterations):
+                start = time.perf_counter()
+                transform(open_image(io.BytesIO(contents), Config.IMAGE_SIZE))
+                if i >= warmup:
+                    timings.append(time.perf_counter() - start)
+
+            median = statistics.median(timings)
+            results.append({
+                "image_size": size,
+                "format": image_format,
+                "bytes": len(contents),
+                "images_per_s": round(1 / median, 2),
+                **percentiles(timings),
+            })
+            print(f"  {size:>9} {image_format:<4}: {1 / median:8.1f} img/s  (p50 {median * 1000:.2f} ms)")
+    return results
+
+
+# (c) Carga ponta a ponta na API
+
+def multipart_body(filename: str, contents: bytes, boundary: str) -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + contents + f"\r\n--{boundary}--\r\n".encode()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(host: str, port: int, process: Optional[subprocess.Popen] = None,
+                       timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"A API encerrou durante a inicialização (código {process.returncode})")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request("GET", "/health/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"A API não respondeu em {host}:{port} dentro de {timeout:.0f}s")
+
+
+def start_server(workdir: str) -> Tuple[subprocess.Popen, int]:
+    """Sobe a API com uvicorn num diretório temporário (uploads/ e banco descartáveis)"""
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": API_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env)
+    try:
+        wait_until_healthy("127.0.0.1", port, process)
+    except Exception:
+        process.terminate()
+        raise
+    return process, port
+
+
+def run_load(host: str, port: int, concurrency: int, requests: int, unique: bool) -> Dict[str, Any]:
+    """Envia ``requests`` uploads com ``concurrency`` conexões keep-alive simultâneas.
+
+    Com ``unique``, cada requisição recebe bytes distintos (um sufixo após o fim
+    do PNG, ignorado pelo decoder), forçando falhas no cache de predições; sem
+    ele, as duas imagens de teste se repetem e medem o caminho do cache.
+    """
+    images = []
+    for path in TEST_IMAGES:
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    boundary = uuid.uuid4().hex
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    results_lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            filename, contents = images[index % len(images)]
+            if unique:
+                contents += f"benchmark-{uuid.uuid4().hex}".encode()
+            body = multipart_body(filename, contents, boundary)
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/predict/", body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                status = 0
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "unique_images": unique,
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    if latencies:
+        result.update(percentiles(latencies))
+    print(f"  concorrência {concurrency:>3}, {'únicas' if unique else 'repetidas'}: "
+          f"{result['requests_per_s']:8.1f} req/s  (p50 {result.get('p50_ms', 0):.1f} ms, "
+          f"p99 {result.get('p99_ms', 0):.1f} ms, status {result['status_counts']})")
+    return result
+
+
+def bench_api(url: Optional[str], concurrency_levels: List[int], requests: int) -> List[Dict[str, Any]]:
+    process = None
+    with tempfile.TemporaryDirectory(prefix="catdog-bench-") as workdir:
+        if url:
+            host, _, port = url.replace("http://", "").rstrip("/").partition(":")
+            port = int(port or 80)
+        else:
+            process, port = start_server(workdir)
+            host = "127.0.0.1"
+        try:
+            run_load(host, port, 1, min(requests, 20), unique=True)  # aquecimento
+            return [run_load(host, port, concurrency, requests, unique)
+                    for unique in (True, False) for concurrency in concurrency_levels]
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+
+# Comparação entre execuções
+
+def compare(baseline_path: str, current_path: str, tolerance: float) -> int:
+    """Compara duas execuções; retorna 1 se alguma vazão caiu mais que ``tolerance``"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    keys = {
+        "model": ("batch_size",),
+        "preprocessing": ("image_size", "format"),
+        "api": ("concurrency", "unique_images"),
+    }
+    regressions = 0
+    for section, key_fields in keys.items():
+        if section not in baseline or section not in current:
+            continue
+        metric = "requests_per_s" if section == "api" else "images_per_s"
+        previous = {tuple(row[k] for k in key_fields): row for row in baseline[section]}
+        print(f"{section}:")
+        for row in current[section]:
+            key = tuple(row[k] for k in key_fields)
+            if key not in previous or not previous[key][metric]:
+                continue
+            ratio = row[metric] / previous[key][metric]
+            flag = ""
+            if ratio < 1 - tolerance:
+                flag = "  <-- regressão"
+                regressions += 1
+            label = ", ".join(f"{k}={v}" for k, v in zip(key_fields, key))
+            print(f"  {label:<40} {previous[key][metric]:>10.1f} -> {row[metric]:>10.1f} {metric} "
+                  f"({ratio:.2f}x){flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmarks do classificador e da API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="executa os benchmarks e grava o resultado em JSON")
+    run.add_argument("--suites", nargs="+", choices=["model", "preprocessing", "api"],
+                     default=["model", "preprocessing", "api"])
+    run.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    run.add_argument("--image-sizes", nargs="+", default=DEFAULT_IMAGE_SIZES, help="ex.: 640x480")
+    run.add_argument("--iterations", type=int, default=20)
+    run.add_argument("--warmup", type=int, default=3)
+    run.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    run.add_argument("--requests", type=int, default=200, help="requisições por nível de concorrência")
+    run.add_argument("--url", help="API já em execução (ex.: http://localhost:8000); por padrão sobe uma local")
+    run.add_argument("--output", help="arquivo JSON (padrão: benchmarks/results/<commit>-<data>.json)")
+
+    cmp = subparsers.add_parser("compare", help="compara dois resultados e aponta regressões")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--tolerance", type=float, default=0.1, help="queda relativa tolerada (padrão 10%%)")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args.baseline, args.current, args.tolerance))
+
+    results: Dict[str, Any] = {"environment": environment()}
+    if "model" in args.suites:
+        print(f"Modelo ({Config.MODEL_BACKEND}, {Config.DEVICE}):")
+        results["model"] = bench_model(args.batch_sizes, args.iterations, args.warmup)
+    if "preprocessing" in args.suites:
+        print("Pré-processamento:")
+        results["preprocessing"] = bench_preprocessing(args.image_sizes, args.iterations, args.warmup)
+    if "api" in args.suites:
+        print("API (/predict/):")
+        results["api"] = bench_api(args.url, args.concurrency, args.requests)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{results['environment']['commit'] or 'local'}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
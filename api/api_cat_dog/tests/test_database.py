@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from app.database import Database, encode_cursor, recent_predictions_query
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "predictions.db"))
+    conn = database._connect()
+    rows = [(f"{i}.png", "cat" if i % 2 else "dog", 0.9, f"2025-08-20 10:{i // 60:02d}:{i % 60:02d}")
+            for i in range(500)]
+    database._flush(conn, rows)
+    conn.execute("ANALYZE")
+    conn.close()
+    yield database
+    database.close()
+
+
+def query_plan(db_path, sql, params):
+    with sqlite3.connect(db_path) as conn:
+        return " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+@pytest.mark.parametrize("prediction", [None, "cat"])
+def test_cursor_page_seeks_the_index(db, prediction):
+    cursor = encode_cursor("2025-08-20 10:04:00", 240)
+    sql, params = recent_predictions_query(20, cursor, prediction)
+    plan = query_plan(db.db_path, sql, params)
+    assert "SEARCH predictions USING" in plan and "timestamp<?" in plan, plan
+
+
+def test_cursor_pages_cover_every_row_once(db):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = db.get_recent_predictions(limit=64, cursor=cursor)
+        seen.extend(row["id"] for row in rows)
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == len(set(seen)) == 500
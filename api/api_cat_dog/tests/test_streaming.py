@@ -0,0 +1,72 @@
+import asyncio
+import io
+import random
+import tarfile
+
+from app.streaming import PackageError, StreamingMultipartReader, TarMember
+
+BOUNDARY = "lote"
+
+
+def tar_bytes(members, mode="w"):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def multipart(*files):
+    body = b""
+    for filename, data in files:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{filename}\"\r\n"
+                 f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def read_all(reader, body, chunk_size):
+    """Alimenta o leitor como o endpoint, anotando quantos bytes tinham chegado quando cada item saiu"""
+    received = []
+    for start in range(0, len(body), chunk_size):
+        for part in reader.feed(body[start:start + chunk_size]):
+            received.append((part, start + chunk_size))
+        # Dá tempo para a thread de extração, como a espera pelo próximo pedaço da rede
+        await asyncio.sleep(0.01)
+        async for part in reader.pending():
+            received.append((part, start + chunk_size))
+    for part in reader.close():
+        received.append((part, len(body)))
+    async for part in reader.pending():
+        received.append((part, len(body)))
+    return received
+
+
+def test_tar_members_arrive_while_the_part_is_uploading():
+    rng = random.Random(0)
+    members = [(f"fotos/{i}.jpg", rng.randbytes(50_000)) for i in range(4)]
+    body = multipart(("a.png", b"png"), ("fotos.tar.gz", tar_bytes(members, "w:gz")), ("b.png", b"png2"))
+
+    async def run():
+        reader = StreamingMultipartReader(f"multipart/form-data; boundary={BOUNDARY}")
+        return await read_all(reader, body, 4096)
+
+    received = asyncio.run(run())
+    parts = [part for part, _ in received]
+    assert parts == [("a.png", b"png")] + [TarMember(f"fotos.tar.gz/{name}", data) for name, data in members] \
+        + [("b.png", b"png2")]
+    # O primeiro membro sai antes do fim do upload; a parte seguinte espera o fim da extração
+    assert received[1][1] < len(body)
+
+
+def test_corrupt_tar_becomes_an_error_item():
+    body = multipart(("ruim.tar", b"x" * 3000), ("ok.png", b"png"))
+
+    async def run():
+        reader = StreamingMultipartReader(f"multipart/form-data; boundary={BOUNDARY}")
+        return [part for part, _ in await read_all(reader, body, 1024)]
+
+    error, ok = asyncio.run(run())
+    assert isinstance(error, PackageError) and error.source == "ruim.tar"
+    assert ok == ("ok.png", b"png")
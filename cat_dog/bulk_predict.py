@@ -0,0 +1,260 @@
+import argparse
+import csv
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from config import Config
+from export import load_trained_model
+from manifest import IMAGE_EXTENSIONS
+from precision import autocast, resolve_dtype, to_memory_format
+from preprocessing import BatchBuffer, open_image
+
+FIELDS = ['path', 'prediction', 'probability', 'error']
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def iter_sources(source):
+    """Yields (key, read) for every image in a directory tree, zip or tar archive.
+
+    ``key`` identifies the image in the output (path relative to the source,
+    or the archive member name) and ``read()`` returns its bytes. Files are
+    read in the decode pool; archive members are read one at a time as the
+    generator advances, so archives are never extracted to disk.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), lambda path=path: _read_file(path)
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    # Read here: the archive is closed once the generator is exhausted,
+                    # while the last members may still be waiting in the decode pool
+                    data = archive.read(info)
+                    yield info.filename, lambda data=data: data
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    # Streaming mode: the member must be read before moving to the next one
+                    data = archive.extractfile(member).read()
+                    yield member.name, lambda data=data: data
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        with open(self.path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f)}
+
+    def open(self):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        if new_file:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class NdjsonWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        with open(self.path) as f:
+            return {json.loads(line)['path'] for line in f if line.strip()}
+
+    def open(self):
+        self.file = open(self.path, 'a')
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """Parquet files cannot be appended to, so the output is a directory of part files"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires the pyarrow package")
+        self.pa, self.pq = pa, pq
+        self.path = path
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.parquet'))
+
+    def completed(self):
+        done = set()
+        for name in self._parts():
+            done.update(self.pq.read_table(os.path.join(self.path, name), columns=['path'])['path'].to_pylist())
+        return done
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.next_part = len(self._parts())
+
+    def write(self, rows):
+        table = self.pa.Table.from_pylist(rows, schema=self.pa.schema([
+            ('path', self.pa.string()), ('prediction', self.pa.string()),
+            ('probability', self.pa.float64()), ('error', self.pa.string())
+        ]))
+        part_path = os.path.join(self.path, f"part-{self.next_part:05d}.parquet")
+        self.pq.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+        self.next_part += 1
+
+    def close(self):
+        pass
+
+WRITERS = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'parquet': ParquetWriter}
+
+def truncate_partial_line(path):
+    """Drops a half-written last line left by an interrupted run"""
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+def decode(key, read, transform):
+    """Reads and preprocesses one image; returns (key, tensor, error)"""
+    try:
+        return key, transform(open_image(io.BytesIO(read()), Config.IMAGE_SIZE)), None
+    except Exception as e:
+        return key, None, str(e)
+
+def decode_stream(sources, transform, num_workers, window):
+    """Decodes images in a thread pool, keeping at most ``window`` in flight, in source order"""
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for key, read in sources:
+            pending.append(executor.submit(decode, key, read, transform))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def score(model, tensors, buffer, dtype):
+    batch = to_memory_format(buffer.stack(tensors).to(Config.DEVICE))
+    with torch.no_grad(), autocast(dtype):
+        output = model(batch)
+    return output.float().view(-1).tolist()
+
+def label(prob, threshold=Config.THRESHOLD):
+    """'dog', 'cat' or 'uncertain' for a P(dog), with the same threshold rule as the API"""
+    if prob > threshold:
+        return 'dog'
+    if prob < 1 - threshold:
+        return 'cat'
+    return 'uncertain'
+
+def predict_rows(model, batch, buffer, dtype, threshold=Config.THRESHOLD):
+    if not batch:
+        return []
+    probabilities = score(model, [tensor for _, tensor in batch], buffer, dtype)
+    return [{'path': key, 'prediction': label(prob, threshold), 'probability': round(prob, 6), 'error': None}
+            for (key, _), prob in zip(batch, probabilities)]
+
+def bulk_predict(source, output, output_format, batch_size=Config.BATCH_SIZE,
+                 num_workers=Config.NUM_WORKERS, model_path=Config.MODEL_PATH, resume=True,
+                 threshold=Config.THRESHOLD):
+    """Scores every image in ``source`` and appends one row per image to ``output``.
+
+    With ``resume``, images already present in the output are skipped, so an
+    interrupted run continues where it stopped. Unreadable images get a row
+    with ``error`` set instead of stopping the run. ``threshold`` decides the
+    ``prediction`` column as in ``label``; ``probability`` is always P(dog).
+    """
+    writer = WRITERS[output_format](output)
+    done = set()
+    if resume and os.path.exists(output):
+        if output_format != 'parquet':
+            truncate_partial_line(output)
+        done = writer.completed()
+        print(f"Resuming: {len(done)} images already scored in {output}")
+    elif os.path.exists(output):
+        raise FileExistsError(f"{output} already exists; drop --no-resume to continue it or choose another output")
+
+    model = to_memory_format(load_trained_model(model_path).to(Config.DEVICE))
+    dtype = resolve_dtype()
+    transform = Config.get_transform()
+    buffer = BatchBuffer(batch_size, Config.IMAGE_SIZE)
+
+    sources = ((key, read) for key, read in iter_sources(source) if key not in done)
+    writer.open()
+    scored, start = 0, time.perf_counter()
+    try:
+        batch, rows = [], []
+        for key, tensor, error in decode_stream(sources, transform, num_workers, window=4 * batch_size):
+            if error is not None:
+                rows.append({'path': key, 'prediction': None, 'probability': None, 'error': error})
+            else:
+                batch.append((key, tensor))
+            if len(batch) < batch_size and len(rows) < batch_size:
+                continue
+            rows.extend(predict_rows(model, batch, buffer, dtype, threshold))
+            writer.write(rows)
+            scored += len(rows)
+            batch, rows = [], []
+        rows.extend(predict_rows(model, batch, buffer, dtype, threshold))
+        if rows:
+            writer.write(rows)
+            scored += len(rows)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} images in {elapsed:.1f}s ({scored / max(elapsed, 1e-9):.1f} images/s) -> {output}")
+    return scored
+
+def main():
+    parser = argparse.ArgumentParser(description='Scores a directory tree or zip/tar archive of images offline')
+    parser.add_argument('source', help='directory, .zip or .tar(.gz) with images')
+    parser.add_argument('output', help='output file (a directory for parquet)')
+    parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                        help='output format (default: from the output extension, else csv)')
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--batch-size', type=int, default=Config.BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=Config.NUM_WORKERS, help='decode threads')
+    parser.add_argument('--threshold', type=float, default=Config.THRESHOLD,
+                        help='P(dog) above it is dog, below 1 - threshold cat, otherwise uncertain')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='fail instead of skipping images already in the output')
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lstrip('.').lower()
+    output_format = args.format or {'jsonl': 'ndjson'}.get(extension, extension)
+    if output_format not in WRITERS:
+        output_format = 'csv'
+    bulk_predict(args.source, args.output, output_format, args.batch_size, args.workers, args.model, args.resume,
+                 args.threshold)
+
+if __name__ == '__main__':
+    main()
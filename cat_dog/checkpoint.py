@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import random
+import numpy as np
+import torch
+from config import Config
+
+LATEST_CHECKPOINT = 'latest.pt'
+BEST_CHECKPOINT = 'best.pth'
+
+def capture_rng_state():
+    """RNG state of every generator that affects training (shuffling, augmentation, dropout)"""
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state()
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def _atomic_save(obj, path):
+    # A crash while writing must never leave a truncated checkpoint behind
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def run_fingerprint(optimizer, data_dirs=(Config.TRAIN_DIR, Config.VAL_DIR)):
+    """Hash of the settings and data a run trains with; a checkpoint only resumes a run with the same hash.
+
+    Covers the optimizer hyperparameters, the training-related Config values
+    (except NUM_EPOCHS, so an unfinished run can be extended) and the name,
+    size and mtime of every file in the data directories.
+    """
+    settings = {name: getattr(Config, name) for name in (
+        'BATCH_SIZE', 'IMAGE_SIZE', 'MEAN', 'STD', 'PRECISION', 'CHANNELS_LAST',
+        'EARLY_STOPPING_PATIENCE', 'EARLY_STOPPING_MIN_DELTA', 'USE_SHARDS', 'USE_FEATURE_CACHE',
+        'FEATURE_AUGMENTATIONS')}
+    settings['optimizer'] = [type(optimizer).__name__, optimizer.defaults]
+    files = {}
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        with os.scandir(data_dir) as entries:
+            files[data_dir] = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                                     for entry in entries if entry.is_file())
+    payload = json.dumps([settings, files], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def save_checkpoint(model, optimizer, scaler, epoch, history, early_stopping, fingerprint=None,
+                    completed=False, checkpoint_dir=Config.CHECKPOINT_DIR):
+    """Writes the full training state after ``epoch`` (0-based) has finished.
+
+    ``completed`` marks the last checkpoint of a run (all epochs done or early
+    stop), which is never resumed.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    _atomic_save({
+        'epoch': epoch,
+        'fingerprint': fingerprint,
+        'completed': completed,
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scaler': scaler.state_dict() if scaler.is_enabled() else None,
+        'history': history,
+        'early_stopping': early_stopping.state_dict(),
+        'rng': capture_rng_state()
+    }, os.path.join(checkpoint_dir, LATEST_CHECKPOINT))
+
+def save_best_model(model, checkpoint_dir=Config.CHECKPOINT_DIR):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    _atomic_save(model.state_dict(), os.path.join(checkpoint_dir, BEST_CHECKPOINT))
+
+def load_best_model(model, checkpoint_dir=Config.CHECKPOINT_DIR):
+    """Loads the weights with the lowest validation loss, if any were saved"""
+    path = os.path.join(checkpoint_dir, BEST_CHECKPOINT)
+    if os.path.exists(path):
+        model.load_state_dict(torch.load(path, map_location=Config.DEVICE))
+    return model
+
+def resume_checkpoint(model, optimizer, scaler, early_stopping, fingerprint=None, checkpoint_dir=Config.CHECKPOINT_DIR):
+    """Restores the latest checkpoint in place; returns (next epoch, history), or (0, None) for a fresh run.
+
+    Only an unfinished run trained with the same ``fingerprint`` is resumed;
+    otherwise the reason is printed and training starts from scratch.
+    """
+    path = os.path.join(checkpoint_dir, LATEST_CHECKPOINT)
+    if not os.path.exists(path):
+        return 0, None
+    # The checkpoint holds RNG and optimizer state, not just tensors
+    checkpoint = torch.load(path, map_location=Config.DEVICE, weights_only=False)
+    if checkpoint.get('completed') or checkpoint['epoch'] + 1 >= Config.NUM_EPOCHS:
+        print(f"Not resuming: {path} belongs to a finished run; starting fresh")
+        return 0, None
+    if checkpoint.get('fingerprint') != fingerprint:
+        print(f"Not resuming: {path} was trained with different settings or data; starting fresh")
+        return 0, None
+    model.load_state_dict(checkpoint['model'])
+    optimizer.load_state_dict(checkpoint['optimizer'])
+    if checkpoint['scaler'] and scaler.is_enabled():
+        scaler.load_state_dict(checkpoint['scaler'])
+    early_stopping.load_state_dict(checkpoint['early_stopping'])
+    restore_rng_state(checkpoint['rng'])
+    print(f"Resuming from {path} (epoch {checkpoint['epoch'] + 1} done)")
+    return checkpoint['epoch'] + 1, checkpoint['history']
+
+class EarlyStopping:
+    """Tracks the best validation loss and stops after ``patience`` epochs without improvement"""
+
+    def __init__(self, patience=Config.EARLY_STOPPING_PATIENCE, min_delta=Config.EARLY_STOPPING_MIN_DELTA):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = float('inf')
+        self.best_epoch = None
+        self.bad_epochs = 0
+
+    @property
+    def should_stop(self):
+        return self.patience is not None and self.bad_epochs >= self.patience
+
+    def step(self, epoch, val_loss):
+        """Records an epoch; returns True if it is the new best"""
+        if val_loss < self.best_loss - self.min_delta:
+            self.best_loss = val_loss
+            self.best_epoch = epoch
+            self.bad_epochs = 0
+            return True
+        self.bad_epochs += 1
+        return False
+
+    def state_dict(self):
+        return {'best_loss': self.best_loss, 'best_epoch': self.best_epoch, 'bad_epochs': self.bad_epochs}
+
+    def load_state_dict(self, state):
+        self.best_loss = state['best_loss']
+        self.best_epoch = state['best_epoch']
+        self.bad_epochs = state['bad_epochs']
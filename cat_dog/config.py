@@ -1,5 +1,8 @@
+import os
 import torch
 from torchvision import transforms
+from torchvision.transforms import v2
+from preprocessing import FastTransform
 
 class Config:
     # Data configuration
@@ -7,13 +10,63 @@ class Config:
     DATA_DIR = 'data'
     TRAIN_DIR = 'data/train'
     VAL_DIR = 'data/val'
+    PET_IMAGES_DIR = 'data/PetImages'
     MODEL_PATH = 'cat_dog_classifier.pth'
+    TORCHSCRIPT_PATH = 'cat_dog_classifier.torchscript.pt'
+    ONNX_PATH = 'cat_dog_classifier.onnx'
+    QUANTIZED_MODEL_PATH = 'cat_dog_classifier.int8.pt'
+    QUANTIZED_DYNAMIC_MODEL_PATH = 'cat_dog_classifier.int8_dynamic.pt'
+    QUANT_REPORT_PATH = 'resultados/quantizacao.md'
+    QUANT_CALIBRATION_IMAGES = 512
     
+    # Dataset preparation
+    TRAIN_SAMPLES_PER_CLASS = 1000
+    VAL_SAMPLES_PER_CLASS = 1000
+    SPLIT_SEED = 42
+    PREPARE_WORKERS = 8
+
     # Training parameters
     BATCH_SIZE = 32
     LEARNING_RATE = 0.001
     NUM_EPOCHS = 10
+
+    # Checkpointing and early stopping (see checkpoint.py)
+    CHECKPOINT_DIR = 'checkpoints'
+    RESUME_TRAINING = True  # continue an interrupted run from checkpoints/latest.pt (same settings and data only)
+    CHECKPOINT_EVERY = 1  # epochs between checkpoints
+    EARLY_STOPPING_PATIENCE = 3  # epochs without val loss improvement; None disables it
+    EARLY_STOPPING_MIN_DELTA = 0.0
+
+    # Mixed precision: 'fp32', 'bf16' (CPU or CUDA), 'fp16' (CUDA only) or 'auto' (see precision.py)
+    PRECISION = 'fp32'
+    CHANNELS_LAST = False  # NHWC memory format for the conv layers
+
+    # Frozen-backbone feature cache: extract 512-d features once, train only the head
+    USE_FEATURE_CACHE = False
+    FEATURE_CACHE_DIR = 'data/feature_cache'
+    FEATURE_AUGMENTATIONS = 1  # views per image; view 0 is un-augmented
+
+    # Pre-decoded, memory-mapped uint8 shards (see shards.py)
+    USE_SHARDS = False
+    SHARD_DIR = 'data/shards'
+    SHARD_SIZE = 4096  # images per shard
+    SHARD_PACK_WORKERS = 8
+
+    # Image validation manifest (see manifest.py)
+    MANIFEST_WORKERS = os.cpu_count() or 1
+
+    # DataLoader settings
+    NUM_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+    PERSISTENT_WORKERS = True
+    PREFETCH_FACTOR = 2
+    PIN_MEMORY = torch.cuda.is_available()
+    AUTOTUNE_LOADER = False  # benchmark worker/prefetch candidates at startup and keep the fastest
+    AUTOTUNE_BATCHES = 20
     
+    # Classification: P(dog) above THRESHOLD is a dog, below 1 - THRESHOLD a cat, otherwise
+    # uncertain (same rule as the API's THRESHOLD)
+    THRESHOLD = 0.5
+
     # Image transformations
     IMAGE_SIZE = 224
     MEAN = [0.485, 0.456, 0.406]
@@ -24,8 +77,22 @@ class Config:
     
     @staticmethod
     def get_transform():
+        # Fused Resize -> ToTensor -> Normalize (see preprocessing.py)
+        return FastTransform(Config.IMAGE_SIZE, Config.MEAN, Config.STD)
+
+    @staticmethod
+    def get_augment_transform():
         return transforms.Compose([
-            transforms.Resize((Config.IMAGE_SIZE, Config.IMAGE_SIZE)),
+            transforms.RandomResizedCrop(Config.IMAGE_SIZE, scale=(0.8, 1.0)),
+            transforms.RandomHorizontalFlip(),
             transforms.ToTensor(),
             transforms.Normalize(mean=Config.MEAN, std=Config.STD)
+        ])
+
+    @staticmethod
+    def get_tensor_augment_transform():
+        # Same augmentation on (3, H, W) uint8 tensors, for the already decoded shards
+        return v2.Compose([
+            v2.RandomResizedCrop(Config.IMAGE_SIZE, scale=(0.8, 1.0), antialias=True),
+            v2.RandomHorizontalFlip()
         ])
\ No newline at end of file
@@ -1,20 +1,26 @@
+import copy
+import json
 import os
 import random
+import threading
 import shutil
 import urllib.request
 import zipfile
 import logging
-from PIL import Image
-import torch
+import time
+from concurrent.futures import ThreadPoolExecutor
 from torch.utils.data import Dataset, DataLoader
 from config import Config
+from preprocessing import open_image
+from shards import load_sharded_dataset
+from manifest import valid_images
 import ssl
 
 class DataHandler:
     @staticmethod
-    def download_and_extract(url, data_dir):
+    def download_and_extract(url, data_dir, num_workers=Config.PREPARE_WORKERS):
         ssl._create_default_https_context = ssl._create_unverified_context
-        """Downloads and extracts dataset"""
+        """Downloads the dataset and extracts only members missing on disk"""
         try:
             os.makedirs(data_dir, exist_ok=True)
             filename = os.path.basename(url)
@@ -24,8 +30,7 @@ class DataHandler:
                 urllib.request.urlretrieve(url, filepath)
             
             if filepath.endswith('.zip'):
-                with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                    zip_ref.extractall(data_dir)
+                DataHandler.extract_missing(filepath, data_dir, num_workers)
             
             os.makedirs(os.path.join(data_dir, 'train'), exist_ok=True)
             os.makedirs(os.path.join(data_dir, 'val'), exist_ok=True)
@@ -35,50 +40,179 @@ class DataHandler:
             raise
 
     @staticmethod
-    def copy_random_files(source, dest, num_files, prefix):
-        """Copies random files with prefix"""
-        files = [f for f in os.listdir(source) if os.path.isfile(os.path.join(source, f))]
-        files = random.sample(files, min(num_files, len(files)))
-        
-        os.makedirs(dest, exist_ok=True)
-        for file in files:
-            new_name = f"{prefix}.{file}"
-            shutil.copy2(os.path.join(source, file), os.path.join(dest, new_name))
+    def extract_missing(zip_path, data_dir, num_workers=Config.PREPARE_WORKERS):
+        """Extracts members that are absent or have a different size, in parallel"""
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            members = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+        def is_missing(info):
+            target = os.path.join(data_dir, info.filename)
+            return not os.path.exists(target) or os.path.getsize(target) != info.file_size
+
+        missing = [info.filename for info in members if is_missing(info)]
+        if not missing:
+            print(f"{zip_path}: all {len(members)} files already extracted")
+            return
+
+        # ZipFile handles are not safe to share between threads: one per worker
+        local = threading.local()
+        def extract(name):
+            if not hasattr(local, 'zip_ref'):
+                local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            local.zip_ref.extract(name, data_dir)
+
+        print(f"{zip_path}: extracting {len(missing)} of {len(members)} files")
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(extract, missing))
+
+    @staticmethod
+    def create_splits(sources, train_dir, val_dir, train_per_class, val_per_class,
+                      seed=Config.SPLIT_SEED, num_workers=Config.PREPARE_WORKERS):
+        """Creates disjoint, seeded train/val splits as hard links.
+
+        ``sources`` maps a class prefix to its source directory, e.g.
+        {'cat': 'data/PetImages/Cat'}. Each class is shuffled once with ``seed``
+        and cut into non-overlapping train and val slices. Files are hard-linked
+        (copied only if linking is not possible), files already in place are
+        kept and files no longer selected are removed. The selection is saved
+        to ``<data dir>/splits.json``.
+        """
+        rng = random.Random(seed)
+        selected = {train_dir: {}, val_dir: {}}
+        for prefix, source in sorted(sources.items()):
+            files = sorted(f for f in os.listdir(source) if os.path.isfile(os.path.join(source, f)))
+            rng.shuffle(files)
+            if train_per_class + val_per_class > len(files):
+                logging.warning(f"{source} has only {len(files)} files for "
+                                f"{train_per_class} train + {val_per_class} val")
+            splits = {train_dir: files[:train_per_class],
+                      val_dir: files[train_per_class:train_per_class + val_per_class]}
+            for split_dir, split_files in splits.items():
+                for file in split_files:
+                    selected[split_dir][f"{prefix}.{file}"] = os.path.join(source, file)
+
+        links = []
+        for split_dir, files in selected.items():
+            os.makedirs(split_dir, exist_ok=True)
+            for existing in os.listdir(split_dir):
+                if existing not in files and os.path.isfile(os.path.join(split_dir, existing)):
+                    os.remove(os.path.join(split_dir, existing))
+            links.extend((src, os.path.join(split_dir, name)) for name, src in files.items())
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            created = sum(executor.map(lambda pair: DataHandler.link_file(*pair), links))
+        print(f"Splits ready: {len(selected[train_dir])} train / {len(selected[val_dir])} val "
+              f"({created} files linked)")
+
+        split_manifest = os.path.join(os.path.dirname(os.path.normpath(train_dir)), 'splits.json')
+        with open(split_manifest, 'w') as f:
+            json.dump({'seed': seed, 'train': sorted(selected[train_dir]),
+                       'val': sorted(selected[val_dir])}, f)
+        return selected
+
+    @staticmethod
+    def link_file(source, dest):
+        """Hard-links source to dest unless it is already there; returns True if created"""
+        if os.path.exists(dest):
+            if os.path.samefile(source, dest):
+                return False
+            os.remove(dest)
+        try:
+            os.link(source, dest)
+        except OSError:
+            # Different filesystem or no hard link support
+            shutil.copy2(source, dest)
+        return True
 
 class CatDogDataset(Dataset):
+    """Images listed in the validation manifest; corrupt files are never opened"""
     def __init__(self, root_dir, transform=None):
         self.root_dir = root_dir
         self.transform = transform
-        self.images = [f for f in os.listdir(root_dir) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
+        entries = valid_images(root_dir)
+        self.images = [name for name, _ in entries]
+        self.labels = [label for _, label in entries]
         
     def __len__(self):
         return len(self.images)
     
     def __getitem__(self, idx):
-        img_name = self.images[idx]
-        img_path = os.path.join(self.root_dir, img_name)
+        img_path = os.path.join(self.root_dir, self.images[idx])
+        image = open_image(img_path, Config.IMAGE_SIZE)
         
-        try:
-            image = Image.open(img_path).convert('RGB')
-            label = 0 if 'cat' in img_name.lower() else 1
+        if self.transform:
+            image = self.transform(image)
             
-            if self.transform:
-                image = self.transform(image)
-                
-            return image, label
-        except Exception as e:
-            print(f"Error loading {img_path}: {e}")
-            return self.__getitem__(torch.randint(0, len(self)-1, (1,)).item())
+        return image, self.labels[idx]
+
+    def augmented(self):
+        """Copy of the dataset that yields randomly augmented views"""
+        view = copy.copy(self)
+        view.transform = Config.get_augment_transform()
+        return view
+
+def loader_settings(num_workers=None, prefetch_factor=None):
+    """DataLoader keyword arguments from Config, optionally overriding workers/prefetch"""
+    num_workers = Config.NUM_WORKERS if num_workers is None else num_workers
+    settings = {'num_workers': num_workers, 'pin_memory': Config.PIN_MEMORY}
+    # persistent_workers and prefetch_factor are only valid with worker processes
+    if num_workers > 0:
+        settings['persistent_workers'] = Config.PERSISTENT_WORKERS
+        settings['prefetch_factor'] = Config.PREFETCH_FACTOR if prefetch_factor is None else prefetch_factor
+    return settings
+
+def measure_throughput(dataset, settings, num_batches=Config.AUTOTUNE_BATCHES):
+    """Images per second delivered by a DataLoader with the given settings"""
+    loader = DataLoader(dataset, batch_size=Config.BATCH_SIZE, shuffle=True,
+                        **{**settings, 'persistent_workers': False})
+    iterator = iter(loader)
+    next(iterator)  # warm-up: worker start-up is not part of the steady state
+    images, start = 0, time.perf_counter()
+    for _ in range(num_batches):
+        try:
+            batch, _ = next(iterator)
+        except StopIteration:
+            break
+        images += batch.size(0)
+    elapsed = time.perf_counter() - start
+    del iterator
+    return images / elapsed if elapsed > 0 else 0.0
+
+def autotune_loader_settings(dataset):
+    """Benchmarks worker/prefetch candidates on this host and returns the fastest settings"""
+    cpus = os.cpu_count() or 1
+    worker_candidates = sorted({0, 2, max(1, cpus // 2), Config.NUM_WORKERS, cpus})
+    candidates = [loader_settings(0)] + [
+        loader_settings(workers, prefetch)
+        for workers in worker_candidates if workers > 0
+        for prefetch in (2, 4)
+    ]
+
+    best, best_rate = loader_settings(), -1.0
+    for settings in candidates:
+        rate = measure_throughput(dataset, settings)
+        print(f"Loader workers={settings['num_workers']} "
+              f"prefetch={settings.get('prefetch_factor', '-')}: {rate:.1f} images/s")
+        if rate > best_rate:
+            best, best_rate = settings, rate
+
+    print(f"Selected loader settings: {best} ({best_rate:.1f} images/s)")
+    return best
 
 def prepare_data_loaders():
     """Prepares and returns train and validation data loaders"""
     transform = Config.get_transform()
     
-    train_dataset = CatDogDataset(Config.TRAIN_DIR, transform)
-    val_dataset = CatDogDataset(Config.VAL_DIR, transform)
+    if Config.USE_SHARDS:
+        train_dataset = load_sharded_dataset(Config.TRAIN_DIR, os.path.join(Config.SHARD_DIR, 'train'))
+        val_dataset = load_sharded_dataset(Config.VAL_DIR, os.path.join(Config.SHARD_DIR, 'val'))
+    else:
+        train_dataset = CatDogDataset(Config.TRAIN_DIR, transform)
+        val_dataset = CatDogDataset(Config.VAL_DIR, transform)
+    
+    settings = autotune_loader_settings(train_dataset) if Config.AUTOTUNE_LOADER else loader_settings()
     
-    train_loader = DataLoader(train_dataset, batch_size=Config.BATCH_SIZE, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=Config.BATCH_SIZE, shuffle=False)
+    train_loader = DataLoader(train_dataset, batch_size=Config.BATCH_SIZE, shuffle=True, **settings)
+    val_loader = DataLoader(val_dataset, batch_size=Config.BATCH_SIZE, shuffle=False, **settings)
     
     return train_loader, val_loader
\ No newline at end of file
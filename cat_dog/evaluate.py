@@ -1,11 +1,13 @@
 import torch
 import matplotlib.pyplot as plt
 from PIL import Image
+from config import Config
+from preprocessing import open_image
 
 def predict_image(image_path, model, transform, device):
     """Predicts whether image is cat or dog"""
     try:
-        image = Image.open(image_path).convert('RGB')
+        image = open_image(image_path, Config.IMAGE_SIZE)
         image = transform(image).unsqueeze(0).to(device)
         
         model.eval()
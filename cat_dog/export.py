@@ -0,0 +1,75 @@
+import argparse
+import torch
+from config import Config
+from model import CatDogClassifier
+
+def load_trained_model(model_path=Config.MODEL_PATH):
+    """Loads the trained classifier on CPU in eval mode"""
+    model = CatDogClassifier()
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    model.eval()
+    return model
+
+def example_input(batch_size=1):
+    return torch.randn(batch_size, 3, Config.IMAGE_SIZE, Config.IMAGE_SIZE)
+
+def export_torchscript(model, output_path):
+    """Traces the model and saves a frozen TorchScript module"""
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input())
+        traced = torch.jit.freeze(traced)
+    traced.save(output_path)
+    return output_path
+
+def export_onnx(model, output_path):
+    """Exports the model to ONNX with a dynamic batch dimension"""
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example_input(),
+            output_path,
+            input_names=['input'],
+            output_names=['output'],
+            dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+            opset_version=17
+        )
+    return output_path
+
+def check_parity(model, torchscript_path, onnx_path, atol=1e-4, batch_size=8):
+    """Compares exported artifacts against the eager model on random input"""
+    inputs = example_input(batch_size)
+    with torch.no_grad():
+        expected = model(inputs)
+        results = {'torchscript': (torch.jit.load(torchscript_path)(inputs) - expected).abs().max().item()}
+
+    try:
+        import onnxruntime as ort
+        session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        output = session.run(None, {'input': inputs.numpy()})[0]
+        results['onnxruntime'] = (torch.from_numpy(output) - expected).abs().max().item()
+    except ImportError:
+        print("onnxruntime not installed, skipping ONNX parity check")
+
+    for backend, max_diff in results.items():
+        status = 'OK' if max_diff <= atol else 'MISMATCH'
+        print(f"{backend}: max abs diff {max_diff:.2e} [{status}]")
+
+    if any(max_diff > atol for max_diff in results.values()):
+        raise RuntimeError(f"Exported model differs from eager model by more than {atol}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the cat/dog classifier to TorchScript and ONNX")
+    parser.add_argument('--model', default=Config.MODEL_PATH, help="trained state_dict (.pth)")
+    parser.add_argument('--torchscript', default=Config.TORCHSCRIPT_PATH, help="TorchScript output path")
+    parser.add_argument('--onnx', default=Config.ONNX_PATH, help="ONNX output path")
+    parser.add_argument('--atol', type=float, default=1e-4, help="parity check tolerance")
+    args = parser.parse_args()
+
+    model = load_trained_model(args.model)
+    print(f"TorchScript saved to {export_torchscript(model, args.torchscript)}")
+    print(f"ONNX saved to {export_onnx(model, args.onnx)}")
+    check_parity(model, args.torchscript, args.onnx, atol=args.atol)
+
+if __name__ == "__main__":
+    main()
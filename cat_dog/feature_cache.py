@@ -0,0 +1,83 @@
+import copy
+import hashlib
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from numpy.lib.format import open_memmap
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+from config import Config
+from data_preparation import loader_settings
+
+def backbone_hash(model):
+    """Hash of the frozen backbone weights (the trainable fc head is excluded)"""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        if name.startswith('model.fc.'):
+            continue
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def dataset_key(dataset, model_digest, augmentations):
+    """Cache key: files (name, size, mtime), backbone weights and augmentation count"""
+    digest = hashlib.sha256(f"{model_digest}:{augmentations}:{Config.IMAGE_SIZE}".encode())
+    for name in dataset.images:
+        stat = os.stat(os.path.join(dataset.root_dir, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:24]
+
+def build_backbone(model):
+    """ResNet18 up to the global average pool, producing 512-d features"""
+    backbone = copy.deepcopy(model.model)
+    backbone.fc = nn.Identity()
+    return backbone.to(Config.DEVICE).eval()
+
+def extract_features(model, dataset, cache_dir=Config.FEATURE_CACHE_DIR,
+                     augmentations=Config.FEATURE_AUGMENTATIONS):
+    """Returns (features, labels) for a dataset, running the backbone only on a cache miss.
+
+    ``features`` is a memory-mapped float32 array of shape (augmentations, N, 512):
+    view 0 uses the dataset's own transform and the others use random
+    augmentations, so the head can see a different view each epoch.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = dataset_key(dataset, backbone_hash(model), augmentations)
+    features_path = os.path.join(cache_dir, f"{key}.features.npy")
+    labels_path = os.path.join(cache_dir, f"{key}.labels.npy")
+
+    if os.path.exists(features_path) and os.path.exists(labels_path):
+        print(f"Using cached features {features_path}")
+        return np.load(features_path, mmap_mode='r'), np.load(labels_path)
+
+    backbone = build_backbone(model)
+    num_features = model.model.fc.in_features
+    tmp_path = features_path + '.tmp.npy'
+    features = open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                           shape=(augmentations, len(dataset), num_features))
+    labels = np.empty(len(dataset), dtype=np.int64)
+
+    for view in range(augmentations):
+        view_dataset = dataset.augmented() if view > 0 else dataset
+        loader = DataLoader(view_dataset, batch_size=Config.BATCH_SIZE, shuffle=False, **loader_settings())
+
+        offset = 0
+        with torch.no_grad():
+            for images, batch_labels in tqdm(loader, desc=f"Extracting features (view {view + 1}/{augmentations})"):
+                batch_features = backbone(images.to(Config.DEVICE)).cpu().numpy()
+                features[view, offset:offset + len(batch_features)] = batch_features
+                if view == 0:
+                    labels[offset:offset + len(batch_labels)] = batch_labels.numpy()
+                offset += len(batch_features)
+
+    features.flush()
+    del features
+    os.replace(tmp_path, features_path)
+    np.save(labels_path, labels)
+    with open(os.path.join(cache_dir, f"{key}.json"), 'w') as f:
+        json.dump({'root_dir': dataset.root_dir, 'num_images': len(dataset),
+                   'augmentations': augmentations, 'num_features': num_features}, f)
+
+    return np.load(features_path, mmap_mode='r'), labels
@@ -2,7 +2,7 @@ import torch
 from config import Config
 from data_preparation import DataHandler, prepare_data_loaders
 from model import initialize_model
-from train import train_model
+from train import train_model, train_model_cached
 from evaluate import plot_training_history, visualize_predictions
 
 def main():
@@ -11,16 +11,13 @@ def main():
       print("Step 1: Prepare data")
       DataHandler.download_and_extract(Config.DATA_URL, Config.DATA_DIR)
       
-      # Copy sample files (you would call these with your actual paths)
-      print("Copy sample files to training")
-      DataHandler.copy_random_files("data/PetImages/Cat", Config.TRAIN_DIR, 1000, 'cat')
-      DataHandler.copy_random_files("data/PetImages/Dog", Config.TRAIN_DIR, 1000, 'dog')
-
-      # Similar for validation...
-      # Copy sample files (you would call these with your actual paths)
-      print("Copy sample files to validate")
-      DataHandler.copy_random_files("data/PetImages/Cat", Config.VAL_DIR, 1000, 'cat')
-      DataHandler.copy_random_files("data/PetImages/Dog", Config.VAL_DIR, 1000, 'dog')
+      # Disjoint, seeded train/val samples, hard-linked from PetImages
+      print("Create train/val splits")
+      DataHandler.create_splits(
+          {'cat': f"{Config.PET_IMAGES_DIR}/Cat", 'dog': f"{Config.PET_IMAGES_DIR}/Dog"},
+          Config.TRAIN_DIR, Config.VAL_DIR,
+          Config.TRAIN_SAMPLES_PER_CLASS, Config.VAL_SAMPLES_PER_CLASS
+      )
       
       print("prepare_data_loaders")
       train_loader, val_loader = prepare_data_loaders()
@@ -31,7 +28,10 @@ def main():
       
       # Step 3: Train model
       print("Step 3: Train model")
-      history = train_model(model, train_loader, val_loader, criterion, optimizer)
+      if Config.USE_FEATURE_CACHE:
+          history = train_model_cached(model, train_loader, val_loader, criterion, optimizer)
+      else:
+          history = train_model(model, train_loader, val_loader, criterion, optimizer)
       
       # Step 4: Save model
       print("Step 4: Save model")
@@ -0,0 +1,83 @@
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from config import Config
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+def manifest_path(root_dir):
+    """Manifest lives next to the directory it describes, e.g. data/train.manifest.json"""
+    return os.path.normpath(root_dir) + '.manifest.json'
+
+def label_for(name):
+    return 0 if 'cat' in name.lower() else 1
+
+def validate_image(path):
+    """Fully decodes one image; returns (width, height, error)"""
+    try:
+        if os.path.getsize(path) == 0:
+            return None, None, 'empty file'
+        with warnings.catch_warnings():
+            # PetImages has many files with harmless EXIF warnings
+            warnings.simplefilter('ignore')
+            with Image.open(path) as image:
+                width, height = image.size
+                # Reduced-scale decode still reads the whole stream, so truncation is caught
+                image.draft('RGB', (Config.IMAGE_SIZE, Config.IMAGE_SIZE))
+                image.convert('RGB').load()
+        return width, height, None
+    except Exception as e:
+        return None, None, str(e)
+
+def build_manifest(root_dir, num_workers=Config.MANIFEST_WORKERS):
+    """Validates every image in root_dir and caches the result.
+
+    Files whose size and mtime match the cached manifest are not decoded
+    again; new or modified files are validated in a process pool. Returns the
+    manifest as {file name: entry}.
+    """
+    path = manifest_path(root_dir)
+    cached = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+
+    manifest, to_validate = {}, []
+    with os.scandir(root_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            previous = cached.get(entry.name)
+            if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                manifest[entry.name] = previous
+            else:
+                manifest[entry.name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                        'label': label_for(entry.name)}
+                to_validate.append(entry.name)
+
+    if to_validate:
+        print(f"Validating {len(to_validate)} images in {root_dir}...")
+        paths = [os.path.join(root_dir, name) for name in to_validate]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = executor.map(validate_image, paths, chunksize=64)
+            for name, (width, height, error) in zip(to_validate, results):
+                manifest[name].update({'valid': error is None, 'width': width, 'height': height, 'error': error})
+
+    if to_validate or len(manifest) != len(cached):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    invalid = sum(1 for entry in manifest.values() if not entry['valid'])
+    if invalid:
+        print(f"{invalid} invalid images in {root_dir} will be ignored (see {path})")
+    return manifest
+
+def valid_images(root_dir):
+    """Sorted (file name, label) pairs of the images that passed validation"""
+    manifest = build_manifest(root_dir)
+    return [(name, entry['label']) for name, entry in sorted(manifest.items()) if entry['valid']]
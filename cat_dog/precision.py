@@ -0,0 +1,48 @@
+import contextlib
+import torch
+from config import Config
+
+def cpu_supports_bf16():
+    """True if oneDNN has native bfloat16 kernels on this CPU (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+def resolve_dtype(mode=Config.PRECISION, device=Config.DEVICE):
+    """Maps Config.PRECISION ('fp32', 'bf16', 'fp16' or 'auto') to an autocast dtype, or None for FP32"""
+    if mode == 'auto':
+        if device.type == 'cuda':
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return torch.bfloat16 if cpu_supports_bf16() else None
+    if mode == 'bf16':
+        return torch.bfloat16
+    if mode == 'fp16':
+        if device.type != 'cuda':
+            raise ValueError("fp16 autocast requires CUDA; use 'bf16' on CPU")
+        return torch.float16
+    if mode == 'fp32':
+        return None
+    raise ValueError(f"Unknown precision mode: {mode}")
+
+def autocast(dtype, device=Config.DEVICE):
+    """Autocast context for the given dtype; no-op for FP32"""
+    if dtype is None:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device.type, dtype=dtype)
+
+def to_memory_format(tensor_or_model):
+    """Converts a model or a 4D batch to channels-last when Config.CHANNELS_LAST is on"""
+    if not Config.CHANNELS_LAST:
+        return tensor_or_model
+    if isinstance(tensor_or_model, torch.Tensor) and tensor_or_model.dim() != 4:
+        return tensor_or_model
+    return tensor_or_model.to(memory_format=torch.channels_last)
+
+def grad_scaler(dtype, device=Config.DEVICE):
+    """Loss scaling is only needed for float16 on CUDA"""
+    enabled = device.type == 'cuda' and dtype == torch.float16
+    # torch.amp.GradScaler only exists from torch 2.3; older releases have the CUDA-only class
+    if hasattr(torch.amp, 'GradScaler'):
+        return torch.amp.GradScaler('cuda', enabled=enabled)
+    return torch.cuda.amp.GradScaler(enabled=enabled)
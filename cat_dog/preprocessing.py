@@ -0,0 +1,66 @@
+import numpy as np
+import torch
+from PIL import Image
+
+def _as_hw(size):
+    return (size, size) if isinstance(size, int) else tuple(size)
+
+def open_image(source, size):
+    """Opens an image as RGB, letting JPEG decode at reduced scale when possible.
+
+    ``draft`` makes libjpeg downscale by 1/2, 1/4 or 1/8 in the DCT domain while
+    keeping both sides >= the target size, so multi-megapixel photos never get
+    fully decoded just to be resized to 224x224.
+    """
+    height, width = _as_hw(size)
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        image.draft('RGB', (width, height))
+    return image.convert('RGB')
+
+class FastTransform:
+    """Resize + ToTensor + Normalize in a single pass.
+
+    Equivalent to ``Compose([Resize(size), ToTensor(), Normalize(mean, std)])``
+    but the /255 scaling and the normalization are folded into one
+    multiply-add, written straight into the output tensor.
+    """
+
+    def __init__(self, size, mean, std):
+        self.height, self.width = _as_hw(size)
+        std = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        mean = torch.tensor(mean, dtype=torch.float32).view(3, 1, 1)
+        # (x / 255 - mean) / std == x * scale + bias
+        self.scale = 1.0 / (255.0 * std)
+        self.bias = -mean / std
+
+    def __call__(self, image, out=None):
+        return self.normalize(np.array(self.resize(image), dtype=np.uint8), out)
+
+    def resize(self, image):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != (self.width, self.height):
+            image = image.resize((self.width, self.height), Image.BILINEAR)
+        return image
+
+    def normalize(self, pixels, out=None):
+        """Normalizes an already resized (H, W, 3) uint8 array into a (3, H, W) float tensor"""
+        pixels = torch.from_numpy(pixels).permute(2, 0, 1)
+        if out is None:
+            out = torch.empty((3, self.height, self.width), dtype=torch.float32)
+        torch.mul(pixels, self.scale, out=out)
+        return out.add_(self.bias)
+
+class BatchBuffer:
+    """Preallocated (N, 3, H, W) float tensor reused for every batch"""
+
+    def __init__(self, max_batch_size, size):
+        height, width = _as_hw(size)
+        self.tensor = torch.empty((max_batch_size, 3, height, width), dtype=torch.float32)
+
+    def stack(self, tensors):
+        """Copies samples into the buffer and returns the filled (n, 3, H, W) view"""
+        batch = self.tensor[:len(tensors)]
+        torch.stack(tensors, out=batch)
+        return batch
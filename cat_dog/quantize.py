@@ -0,0 +1,133 @@
+import argparse
+import copy
+import os
+import time
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader, Subset
+from config import Config
+from data_preparation import CatDogDataset
+from export import example_input, load_trained_model
+
+def select_engine():
+    """Picks the best quantized kernel backend available on this CPU"""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("No quantized engine available on this platform")
+
+def build_loader(data_dir, num_images=None, seed=0):
+    """Validation loader, optionally restricted to a random sample"""
+    dataset = CatDogDataset(data_dir, Config.get_transform())
+    if num_images is not None and num_images < len(dataset):
+        generator = torch.Generator().manual_seed(seed)
+        indices = torch.randperm(len(dataset), generator=generator)[:num_images].tolist()
+        dataset = Subset(dataset, indices)
+    return DataLoader(dataset, batch_size=Config.BATCH_SIZE, shuffle=False)
+
+def quantize_static(model, calibration_loader, engine):
+    """Post-training static INT8 quantization of the whole network (FX graph mode)"""
+    prepared = prepare_fx(copy.deepcopy(model), get_default_qconfig_mapping(engine),
+                          example_inputs=(example_input(),))
+    with torch.no_grad():
+        for images, _ in calibration_loader:
+            prepared(images)
+    return convert_fx(prepared)
+
+def quantize_fc_dynamic(model):
+    """Dynamic INT8 quantization of the Linear head only; needs no calibration"""
+    return quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+def save_torchscript(model, output_path):
+    """Quantized modules are saved as frozen TorchScript so the API can load them without the class"""
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example_input()))
+    traced.save(output_path)
+    return os.path.getsize(output_path)
+
+def evaluate(model, loader, reference=None):
+    """Accuracy, agreement with a reference model and mean latency per image"""
+    correct, agree, total, elapsed = 0, 0, 0, 0.0
+    with torch.no_grad():
+        for images, labels in loader:
+            start = time.perf_counter()
+            outputs = model(images).view(-1)
+            elapsed += time.perf_counter() - start
+
+            preds = (outputs > 0.5).long()
+            correct += (preds == labels).sum().item()
+            if reference is not None:
+                ref_preds = (reference(images).view(-1) > 0.5).long()
+                agree += (preds == ref_preds).sum().item()
+            total += labels.size(0)
+
+    return {
+        'accuracy': 100 * correct / total,
+        'agreement': 100 * agree / total if reference is not None else 100.0,
+        'ms_per_image': 1000 * elapsed / total
+    }
+
+def write_report(results, output_path):
+    """Writes a markdown table comparing each variant against FP32"""
+    base = results['fp32']
+    lines = [
+        "# Quantization report",
+        "",
+        "| Model | File | Size (MB) | Accuracy (%) | Δ vs FP32 (pp) | Agreement with FP32 (%) | ms/image | Speedup |",
+        "|-------|------|-----------|--------------|----------------|-------------------------|----------|---------|",
+    ]
+    for name, r in results.items():
+        lines.append(
+            f"| {name} | {os.path.basename(r['path'])} | {r['size'] / 2**20:.1f} | {r['accuracy']:.2f} | "
+            f"{r['accuracy'] - base['accuracy']:+.2f} | {r['agreement']:.2f} | {r['ms_per_image']:.2f} | "
+            f"{base['ms_per_image'] / r['ms_per_image']:.2f}x |"
+        )
+    with open(output_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+
+def main():
+    parser = argparse.ArgumentParser(description="Post-training INT8 quantization of the cat/dog classifier")
+    parser.add_argument('--model', default=Config.MODEL_PATH, help="trained state_dict (.pth)")
+    parser.add_argument('--data', default=Config.VAL_DIR, help="validation images")
+    parser.add_argument('--calibration-images', type=int, default=Config.QUANT_CALIBRATION_IMAGES)
+    parser.add_argument('--eval-images', type=int, default=None, help="limit evaluation to a sample")
+    parser.add_argument('--output', default=Config.QUANTIZED_MODEL_PATH, help="static INT8 TorchScript output")
+    parser.add_argument('--dynamic-output', default=Config.QUANTIZED_DYNAMIC_MODEL_PATH,
+                        help="dynamic INT8 (fc only) TorchScript output")
+    parser.add_argument('--report', default=Config.QUANT_REPORT_PATH)
+    args = parser.parse_args()
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    engine = select_engine()
+    print(f"Quantized engine: {engine}")
+
+    fp32 = load_trained_model(args.model)
+    calibration_loader = build_loader(args.data, args.calibration_images, seed=0)
+    eval_loader = build_loader(args.data, args.eval_images, seed=1)
+
+    print("Static INT8 quantization (calibrating)...")
+    static_int8 = quantize_static(fp32, calibration_loader, engine)
+    print("Dynamic INT8 quantization of the fc head...")
+    dynamic_int8 = quantize_fc_dynamic(fp32)
+
+    variants = {
+        'fp32': (fp32, args.model, os.path.getsize(args.model)),
+        'int8_static': (static_int8, args.output, save_torchscript(static_int8, args.output)),
+        'int8_dynamic_fc': (dynamic_int8, args.dynamic_output, save_torchscript(dynamic_int8, args.dynamic_output)),
+    }
+
+    results = {}
+    for name, (model, path, size) in variants.items():
+        print(f"Evaluating {name}...")
+        reference = None if name == 'fp32' else fp32
+        results[name] = {'path': path, 'size': size, **evaluate(model, eval_loader, reference)}
+
+    write_report(results, args.report)
+
+if __name__ == "__main__":
+    main()
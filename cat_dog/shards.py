@@ -0,0 +1,153 @@
+import bisect
+import copy
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from numpy.lib.format import open_memmap
+from torch.utils.data import Dataset
+from tqdm import tqdm
+from config import Config
+from preprocessing import open_image
+from manifest import build_manifest, label_for
+
+INDEX_FILE = 'index.json'
+
+def _decode(path, transform):
+    """Decodes and resizes one image to a (H, W, 3) uint8 array, or None if unreadable"""
+    try:
+        return np.asarray(transform.resize(open_image(path, Config.IMAGE_SIZE)), dtype=np.uint8)
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
+        return None
+
+def source_entries(root_dir):
+    """[name, size, mtime_ns] of every image in root_dir that passed manifest validation"""
+    return [[name, entry['size'], entry['mtime_ns']]
+            for name, entry in sorted(build_manifest(root_dir).items()) if entry['valid']]
+
+def shards_up_to_date(root_dir, shard_dir):
+    """True if the shards were packed from the current images of root_dir.
+
+    Compares the per-file entries recorded at pack time with the current
+    manifest, so files rewritten in place (or through a hard link) and images
+    that became valid or invalid are detected, not only added or removed names.
+    """
+    index_path = os.path.join(shard_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path) as f:
+        index = json.load(f)
+    return (index['image_size'] == Config.IMAGE_SIZE
+            and index.get('sources') == source_entries(root_dir))
+
+def pack_dataset(root_dir, shard_dir, shard_size=Config.SHARD_SIZE, num_workers=Config.SHARD_PACK_WORKERS):
+    """Decodes every image once and writes them as contiguous uint8 shards.
+
+    Each shard is a ``.npy`` array of shape (n, H, W, 3); labels go to
+    ``labels.npy`` and ``index.json`` records the shard layout, the packed
+    file names and the (name, size, mtime_ns) of every source image used to
+    detect stale shards. Only images that passed manifest validation are packed.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    transform = Config.get_transform()
+    sources = source_entries(root_dir)
+    files = [name for name, _, _ in sources]
+
+    shards, names, labels = [], [], []
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for start in tqdm(range(0, len(files), shard_size), desc=f"Packing {root_dir}"):
+            chunk = files[start:start + shard_size]
+            arrays = list(executor.map(lambda f: _decode(os.path.join(root_dir, f), transform), chunk))
+            valid = [(name, array) for name, array in zip(chunk, arrays) if array is not None]
+            if not valid:
+                continue
+
+            shard_name = f"shard_{len(shards):05d}.npy"
+            shard = open_memmap(os.path.join(shard_dir, shard_name), mode='w+', dtype=np.uint8,
+                                shape=(len(valid), transform.height, transform.width, 3))
+            for i, (name, array) in enumerate(valid):
+                shard[i] = array
+                names.append(name)
+                labels.append(label_for(name))
+            shard.flush()
+            del shard
+            shards.append({'file': shard_name, 'count': len(valid)})
+
+    np.save(os.path.join(shard_dir, 'labels.npy'), np.asarray(labels, dtype=np.int64))
+    with open(os.path.join(shard_dir, INDEX_FILE), 'w') as f:
+        json.dump({
+            'root_dir': root_dir,
+            'sources': sources,
+            'image_size': Config.IMAGE_SIZE,
+            'shards': shards,
+            'images': names
+        }, f)
+    print(f"Packed {len(names)} images from {root_dir} into {len(shards)} shards "
+          f"({len(files) - len(names)} skipped)")
+
+class ShardedCatDogDataset(Dataset):
+    """Reads images packed by ``pack_dataset`` straight from memory-mapped shards.
+
+    Shards are mapped copy-on-write, so a sample is a view into the page cache
+    that goes to torch without a copy; the only per-sample work is the fused
+    normalization. ``augment`` is an optional transform on the (3, H, W) uint8
+    tensor applied before normalization, ``transform`` an optional extra
+    transform on the normalized tensor.
+
+    Only the shard paths are pickled: the shards are mapped on first access in
+    each DataLoader worker, instead of every worker receiving a copy of them.
+    """
+
+    def __init__(self, shard_dir, transform=None, augment=None):
+        with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.root_dir = index['root_dir']
+        self.images = index['images']
+        self.transform = transform
+        self.augment = augment
+        self.normalizer = Config.get_transform()
+        self.labels = np.load(os.path.join(shard_dir, 'labels.npy'))
+        self.shard_paths = [os.path.join(shard_dir, shard['file']) for shard in index['shards']]
+        self._shards = None
+        self.offsets = np.cumsum([0] + [shard['count'] for shard in index['shards']]).tolist()
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, idx):
+        shard = bisect.bisect_right(self.offsets, idx) - 1
+        pixels = self._shard(shard)[idx - self.offsets[shard]]
+        if self.augment:
+            pixels = self.augment(torch.from_numpy(pixels).permute(2, 0, 1)).permute(1, 2, 0).contiguous().numpy()
+        image = self.normalizer.normalize(pixels)
+        if self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[idx])
+
+    def augmented(self):
+        """Copy of the dataset that yields randomly augmented views"""
+        view = copy.copy(self)
+        view.augment = Config.get_tensor_augment_transform()
+        return view
+
+    def _shard(self, shard):
+        if self._shards is None:
+            self._shards = [np.load(path, mmap_mode='c') for path in self.shard_paths]
+        return self._shards[shard]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = None
+        return state
+
+def load_sharded_dataset(root_dir, shard_dir):
+    """Packs root_dir if its shards are missing or stale, then opens them"""
+    if not shards_up_to_date(root_dir, shard_dir):
+        pack_dataset(root_dir, shard_dir)
+    return ShardedCatDogDataset(shard_dir)
+
+if __name__ == "__main__":
+    pack_dataset(Config.TRAIN_DIR, os.path.join(Config.SHARD_DIR, 'train'))
+    pack_dataset(Config.VAL_DIR, os.path.join(Config.SHARD_DIR, 'val'))
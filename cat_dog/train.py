@@ -1,8 +1,24 @@
+import time
+import numpy as np
 import torch
 from tqdm import tqdm
 from config import Config
+from feature_cache import extract_features
+from checkpoint import (EarlyStopping, load_best_model, resume_checkpoint, run_fingerprint, save_best_model,
+                        save_checkpoint)
+from precision import autocast, grad_scaler, resolve_dtype, to_memory_format
 
-def train_epoch(model, loader, criterion, optimizer):
+def backward_step(loss, optimizer, scaler=None):
+    """Backward pass and optimizer step, through the GradScaler when loss scaling is on"""
+    if scaler is not None and scaler.is_enabled():
+        scaler.scale(loss).backward()
+        scaler.step(optimizer)
+        scaler.update()
+    else:
+        loss.backward()
+        optimizer.step()
+
+def train_epoch(model, loader, criterion, optimizer, dtype=None, scaler=None):
     # Check if GPU is available
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model = model.to(device)# Step 6: Training Setup
@@ -11,53 +27,179 @@ def train_epoch(model, loader, criterion, optimizer):
     running_loss = 0.0
     
     for images, labels in tqdm(loader, desc="Training"):
-        images = images.to(Config.DEVICE)
+        images = to_memory_format(images.to(Config.DEVICE))
         labels = labels.float().unsqueeze(1).to(Config.DEVICE)
         
         optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
+        with autocast(dtype):
+            outputs = model(images)
+        # BCELoss is not autocast-safe, so the loss is always computed in FP32
+        loss = criterion(outputs.float(), labels)
+        backward_step(loss, optimizer, scaler)
         
         running_loss += loss.item() * images.size(0)
         
     return running_loss / len(loader.dataset)
 
-def validate(model, loader, criterion):
+def validate(model, loader, criterion, dtype=None):
     model.eval()
     val_loss = 0.0
     correct = 0
     
     with torch.no_grad():
         for images, labels in tqdm(loader, desc="Validating"):
-            images = images.to(Config.DEVICE)
+            images = to_memory_format(images.to(Config.DEVICE))
             labels = labels.float().unsqueeze(1).to(Config.DEVICE)
             
-            outputs = model(images)
+            with autocast(dtype):
+                outputs = model(images)
+            outputs = outputs.float()
             val_loss += criterion(outputs, labels).item() * images.size(0)
             correct += ((outputs > 0.5).float() == labels).sum().item()
             
     accuracy = 100 * correct / len(loader.dataset)
     return val_loss / len(loader.dataset), accuracy
 
-def train_model(model, train_loader, val_loader, criterion, optimizer):
+def report_precision(model, loader, criterion, dtype):
+    """Runs validation in FP32 and in the reduced-precision mode and prints speedup and accuracy delta"""
+    results = {}
+    for name, mode in (('fp32', None), (str(dtype).replace('torch.', ''), dtype)):
+        start = time.perf_counter()
+        loss, accuracy = validate(model, loader, criterion, mode)
+        if Config.DEVICE.type == 'cuda':
+            torch.cuda.synchronize()
+        results[name] = (time.perf_counter() - start, loss, accuracy)
+
+    (fp32_time, fp32_loss, fp32_acc), (mixed_time, mixed_loss, mixed_acc) = results.values()
+    print(f"Precision report ({' vs '.join(results)}): speedup {fp32_time / mixed_time:.2f}x | "
+          f"Val Loss {fp32_loss:.4f} -> {mixed_loss:.4f} | Val Acc {fp32_acc:.2f}% -> {mixed_acc:.2f}% "
+          f"(delta {mixed_acc - fp32_acc:+.2f})")
+    return results
+
+def run_epochs(model, optimizer, scaler, fingerprint, train_step, validate_step):
+    """Epoch loop shared by ``train_model`` and ``train_model_cached``.
+
+    ``train_step(epoch)`` trains one epoch and returns its loss,
+    ``validate_step()`` returns (val loss, val accuracy). Handles resuming,
+    periodic checkpoints, early stopping and restoring the best weights.
+    """
     history = {
         'train_loss': [],
         'val_loss': [],
         'val_acc': []
     }
+    early_stopping = EarlyStopping()
+    
+    start_epoch = 0
+    if Config.RESUME_TRAINING:
+        start_epoch, saved_history = resume_checkpoint(model, optimizer, scaler, early_stopping, fingerprint)
+        history = saved_history or history
     
-    for epoch in range(Config.NUM_EPOCHS):
+    for epoch in range(start_epoch, Config.NUM_EPOCHS):
+        if early_stopping.should_stop:
+            break
         print(f"\nEpoch {epoch+1}/{Config.NUM_EPOCHS}")
         
-        train_loss = train_epoch(model, train_loader, criterion, optimizer)
-        val_loss, val_acc = validate(model, val_loader, criterion)
+        train_loss = train_step(epoch)
+        val_loss, val_acc = validate_step()
         
         history['train_loss'].append(train_loss)
         history['val_loss'].append(val_loss)
         history['val_acc'].append(val_acc)
         
         print(f"Train Loss: {train_loss:.4f} | Val Loss: {val_loss:.4f} | Val Acc: {val_acc:.2f}%")
+        
+        improved = early_stopping.step(epoch, val_loss)
+        if improved:
+            save_best_model(model)
+        last_epoch = epoch + 1 == Config.NUM_EPOCHS or early_stopping.should_stop
+        # Also checkpoint on improvement, so a resumed run never overwrites best.pth with worse weights
+        if improved or last_epoch or (epoch + 1) % Config.CHECKPOINT_EVERY == 0:
+            save_checkpoint(model, optimizer, scaler, epoch, history, early_stopping, fingerprint,
+                            completed=last_epoch)
     
-    return history
\ No newline at end of file
+    if early_stopping.should_stop:
+        print(f"Early stopping: no val loss improvement for {early_stopping.bad_epochs} epochs")
+    if early_stopping.best_epoch is not None:
+        print(f"Restoring best model from epoch {early_stopping.best_epoch + 1} "
+              f"(Val Loss: {early_stopping.best_loss:.4f})")
+        load_best_model(model)
+    return history
+
+def train_model(model, train_loader, val_loader, criterion, optimizer):
+    """Trains with periodic checkpoints, early stopping and best-model retention.
+
+    The full training state (weights, optimizer, GradScaler, history, RNG and
+    early-stopping counters) goes to ``Config.CHECKPOINT_DIR/latest.pt`` every
+    ``Config.CHECKPOINT_EVERY`` epochs, and a new run resumes from it when
+    ``Config.RESUME_TRAINING`` is set and that run was interrupted with the
+    same settings and data. On return the model holds the weights with the
+    lowest validation loss.
+    """
+    dtype = resolve_dtype()
+    scaler = grad_scaler(dtype)
+    model = to_memory_format(model)
+    
+    history = run_epochs(
+        model, optimizer, scaler, run_fingerprint(optimizer),
+        lambda epoch: train_epoch(model, train_loader, criterion, optimizer, dtype, scaler),
+        lambda: validate(model, val_loader, criterion, dtype))
+    
+    if dtype is not None:
+        report_precision(model, val_loader, criterion, dtype)
+    return history
+
+def train_head_epoch(head, features, targets, criterion, optimizer, dtype=None, scaler=None):
+    """One epoch of the fc head over a (N, 512) view of cached features"""
+    head.train()
+    running_loss = 0.0
+    for batch in torch.randperm(len(features)).split(Config.BATCH_SIZE):
+        inputs = features[batch].to(Config.DEVICE)
+        labels = targets[batch].to(Config.DEVICE)
+        
+        optimizer.zero_grad()
+        with autocast(dtype):
+            logits = head(inputs)
+        loss = criterion(torch.sigmoid(logits.float()), labels)
+        backward_step(loss, optimizer, scaler)
+        
+        running_loss += loss.item() * inputs.size(0)
+    return running_loss / len(features)
+
+def validate_head(head, features, targets, criterion, dtype=None):
+    head.eval()
+    with torch.no_grad():
+        with autocast(dtype):
+            logits = head(features)
+        outputs = torch.sigmoid(logits.float())
+        val_loss = criterion(outputs, targets).item()
+        val_acc = 100 * ((outputs > 0.5).float() == targets).float().mean().item()
+    return val_loss, val_acc
+
+def train_model_cached(model, train_loader, val_loader, criterion, optimizer):
+    """Trains only the fc head on cached backbone features.
+
+    The frozen backbone runs once per image (per augmentation view) and the
+    features are reused for every epoch, instead of one full forward pass
+    over the dataset per epoch. Checkpoints, resuming, early stopping and
+    precision work as in ``train_model``.
+    """
+    train_features, train_labels = extract_features(model, train_loader.dataset)
+    val_features, val_labels = extract_features(model, val_loader.dataset, augmentations=1)
+
+    dtype = resolve_dtype()
+    scaler = grad_scaler(dtype)
+    head = model.model.fc
+    train_targets = torch.from_numpy(train_labels).float().unsqueeze(1)
+    val_inputs = torch.from_numpy(np.asarray(val_features[0])).to(Config.DEVICE)
+    val_targets = torch.from_numpy(val_labels).float().unsqueeze(1).to(Config.DEVICE)
+
+    def train_step(epoch):
+        # Each epoch uses the next augmentation view of the training set
+        view = torch.from_numpy(np.asarray(train_features[epoch % len(train_features)]))
+        return train_head_epoch(head, view, train_targets, criterion, optimizer, dtype, scaler)
+
+    history = run_epochs(model, optimizer, scaler, run_fingerprint(optimizer), train_step,
+                         lambda: validate_head(head, val_inputs, val_targets, criterion, dtype))
+    model.eval()
+    return history
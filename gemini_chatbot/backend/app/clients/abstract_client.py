@@ -1,28 +1,79 @@
 from dotenv import load_dotenv
+import asyncio
 import os
 import google.generativeai as genai
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator, Optional, Tuple
+from app.config import settings
+from app.response_cache import response_cache
 from app.schemas import LLMParameters
 load_dotenv()
 
 class AbstractClient:
+    # Chamadas simultâneas ao provedor e timeout (segundos); definidos por cada subclasse
+    max_concurrency: int = 100
+    timeout: float = 60.0
+    _limiter: asyncio.Semaphore = None
+    # Cópia da configuração de geração deste cliente (faz parte da chave do cache de respostas)
+    llm_config: Dict = {}
+    model_name: str = ""
+    
     def __init__(self, llm_config: LLMParameters):
-        self._configure_client(llm_config)
+        self.llm_config = dict(llm_config)
+        self._configure_client(self.llm_config)
     
     def _configure_client(self,llm_config: LLMParameters):
         pass
     
     def generate_response(self, prompt: str, context: str = None) -> Dict:
         """Gera resposta usando Gemini API"""
+        cache_key, cached = self._cached_response(prompt, context)
+        if cached is not None:
+            return cached
         try:
             # Construir prompt com contexto se fornecido
             full_prompt = self._build_prompt(prompt, context)
             
             response = self.model.generate_content(full_prompt)
             
+            return self._cache_response(cache_key, {
+                "text": response.text,
+                "tokens_used": self._estimate_tokens(full_prompt + response.text)
+            })
+        except Exception as e:
             return {
+                "text": f"Erro ao gerar resposta: {str(e)}",
+                "tokens_used": 0
+            }
+    
+    @property
+    def limiter(self) -> asyncio.Semaphore:
+        """Limita as chamadas simultâneas deste cliente ao provedor"""
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self.max_concurrency)
+        return self._limiter
+    
+    async def generate_response_async(self, prompt: str, context: str = None) -> Dict:
+        """Versão assíncrona de generate_response: não bloqueia o event loop durante a chamada"""
+        cache_key, cached = self._cached_response(prompt, context)
+        if cached is not None:
+            return cached
+        try:
+            full_prompt = self._build_prompt(prompt, context)
+            
+            async with self.limiter:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(full_prompt, request_options={"timeout": self.timeout}),
+                    self.timeout
+                )
+            
+            return self._cache_response(cache_key, {
                 "text": response.text,
                 "tokens_used": self._estimate_tokens(full_prompt + response.text)
+            })
+        except asyncio.TimeoutError:
+            return {
+                "text": f"Erro ao gerar resposta: tempo limite de {self.timeout:.0f}s excedido",
+                "tokens_used": 0
             }
         except Exception as e:
             return {
@@ -30,6 +81,65 @@ class AbstractClient:
                 "tokens_used": 0
             }
     
+    async def generate_response_stream_async(self, prompt: str, context: str = None) -> AsyncIterator[Dict]:
+        """Gera a resposta em partes, à medida que o provedor devolve os tokens.
+        
+        Produz ``{"delta": texto}`` para cada pedaço e, ao final, um único
+        ``{"done": True, "text": ..., "tokens_used": ...}`` com a resposta
+        completa (ou ``{"error": ...}`` se a geração falhar). Uma resposta em
+        cache sai como um único ``delta``.
+        """
+        cache_key, cached = self._cached_response(prompt, context)
+        if cached is not None:
+            yield {"delta": cached["text"]}
+            yield {"done": True, **cached}
+            return
+        full_prompt = self._build_prompt(prompt, context)
+        parts = []
+        try:
+            # O slot fica ocupado até o fim do stream, que é quando a conexão é liberada
+            async with self.limiter:
+                response = await self.model.generate_content_async(
+                    full_prompt, stream=True, request_options={"timeout": self.timeout})
+                async for chunk in response:
+                    text = self._chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        yield {"delta": text}
+        except Exception as e:
+            yield {"error": f"Erro ao gerar resposta: {str(e)}"}
+            return
+        
+        text = "".join(parts)
+        result = self._cache_response(cache_key, {
+            "text": text,
+            "tokens_used": self._estimate_tokens(full_prompt + text)
+        })
+        yield {"done": True, **result}
+    
+    def _cached_response(self, prompt: str, context: str = None) -> Tuple[Optional[Tuple[str, str, str]], Optional[Dict]]:
+        """Chave da chamada no cache de respostas e a resposta guardada, se houver.
+        
+        A chave é None quando o cache não se aplica: desligado ou temperatura
+        acima de RESPONSE_CACHE_MAX_TEMPERATURE (respostas que devem variar).
+        """
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None, None
+        if self.llm_config.get("temperature", 0) > settings.RESPONSE_CACHE_MAX_TEMPERATURE:
+            return None, None
+        cache_key = response_cache.key(self.model_name, self.llm_config, prompt, context)
+        return cache_key, response_cache.get(*cache_key)
+    
+    def _cache_response(self, cache_key: Optional[Tuple[str, str, str]], result: Dict) -> Dict:
+        """Guarda uma resposta bem-sucedida no cache e a devolve"""
+        if cache_key is not None and result["text"]:
+            response_cache.put(*cache_key, result)
+        return result
+    
+    def _chunk_text(self, chunk) -> str:
+        """Texto de um pedaço do stream (alguns pedaços não trazem texto)"""
+        return chunk.text
+    
     def _build_prompt(self, prompt: str, context: str = None) -> str:
         """Constrói o prompt final com contexto"""
         base_prompt = """
@@ -3,18 +3,31 @@ import os
 import google.generativeai as genai
 from typing import List, Dict
 from app.clients.abstract_client import AbstractClient
+from app.config import settings
 from app.schemas import LLMParameters
 load_dotenv()
 
 class GeminiClient(AbstractClient):
+    # As chamadas assíncronas usam o canal gRPC assíncrono do genai, compartilhado pelo processo
+    max_concurrency = settings.GEMINI_MAX_CONCURRENCY
+    timeout = settings.GEMINI_TIMEOUT
+    
     def __init__(self,llm_config: LLMParameters):
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.model_name = os.getenv("GEMINI_MODEL", "gemini-pro")
-        self._configure_client(llm_config)
+        self.llm_config = dict(llm_config)
+        self._configure_client(self.llm_config)
     
     def _configure_client(self,llm_config: LLMParameters):
         """Configura o cliente Gemini"""
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY não encontrada no ambiente")
         
-        self.model = genai.GenerativeModel(self.model_name,generation_config=llm_config)
\ No newline at end of file
+        self.model = genai.GenerativeModel(self.model_name,generation_config=llm_config)
+    
+    def _chunk_text(self, chunk) -> str:
+        """No Gemini, .text levanta ValueError em pedaços sem texto (ex.: só o motivo de parada)"""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
\ No newline at end of file
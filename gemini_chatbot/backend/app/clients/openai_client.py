@@ -3,15 +3,20 @@ import os
 import google.generativeai as genai
 from typing import List, Dict
 from app.clients.abstract_client import AbstractClient
+from app.config import settings
 from app.schemas import LLMParameters
 from app.openai_generative_model import OpenAIGenerativeModel
 load_dotenv()
 
 class OpenAIClient(AbstractClient):
+    max_concurrency = settings.OPENAI_MAX_CONCURRENCY
+    timeout = settings.OPENAI_TIMEOUT
+    
     def __init__(self,llm_config: LLMParameters):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model_name = os.getenv("OPENAI_MODEL", "gemini-pro")
-        self._configure_client(llm_config)
+        self.llm_config = dict(llm_config)
+        self._configure_client(self.llm_config)
     
     def _configure_client(self,llm_config: LLMParameters):
         """Configura o cliente OpenAI"""
@@ -19,4 +24,5 @@ class OpenAIClient(AbstractClient):
             raise ValueError("OPENAI_API_KEY não encontrada no ambiente")
         
         self.model = OpenAIGenerativeModel(self.model_name,generation_config=llm_config)
-        self.model.client.api_key = self.api_key
\ No newline at end of file
+        self.model.client.api_key = self.api_key
+        self.model.async_client.api_key = self.api_key
\ No newline at end of file
@@ -8,5 +8,30 @@ class Settings:
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-pro")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    
+    # Limites por provedor: chamadas simultâneas e timeout (segundos) de cada chamada
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "100"))
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "100"))
+    GEMINI_TIMEOUT: float = float(os.getenv("GEMINI_TIMEOUT", "60"))
+    
+    # Pool de conexões HTTP compartilhado pelas chamadas assíncronas
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    
+    # Cache em memória do histórico recente de cada sessão (por worker)
+    HISTORY_CACHE_MAX_SESSIONS: int = int(os.getenv("HISTORY_CACHE_MAX_SESSIONS", "10000"))
+    HISTORY_CACHE_TTL: float = float(os.getenv("HISTORY_CACHE_TTL", "900"))
+    
+    # Cache de respostas dos provedores para prompts repetidos. Chamadas com temperatura acima
+    # de RESPONSE_CACHE_MAX_TEMPERATURE não usam o cache; o padrão 1 cobre a configuração do
+    # backend (main.llm_config), com 0 só respostas determinísticas são guardadas.
+    # A camada por similaridade é opcional
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    RESPONSE_CACHE_MAX_TEMPERATURE: float = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "1"))
+    RESPONSE_CACHE_SEMANTIC: bool = os.getenv("RESPONSE_CACHE_SEMANTIC", "0").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    RESPONSE_CACHE_SEMANTIC_CANDIDATES: int = int(os.getenv("RESPONSE_CACHE_SEMANTIC_CANDIDATES", "64"))
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+
+# Mensagens anteriores usadas como contexto (a mensagem atual completa o histórico)
+HISTORY_LIMIT = 4
+
+def get_turn_context(db: Session, session_id: str,
+                     limit: int = HISTORY_LIMIT) -> Tuple[Optional[int], List[models.Message]]:
+    """Busca o id da conversa e as últimas mensagens (mais recentes primeiro) em uma única consulta.
+
+    Retorna ``(None, [])`` se a sessão ainda não tem conversa. Nada é gravado
+    aqui: a conversa só é criada junto com as mensagens, depois da geração,
+    para não manter uma transação de escrita aberta durante a chamada ao LLM.
+    """
+    message = aliased(models.Message)
+    rows = db.execute(
+        select(models.Conversation.id, message)
+        .outerjoin(message, message.conversation_id == models.Conversation.id)
+        .where(models.Conversation.session_id == session_id)
+        .order_by(message.timestamp.desc(), message.id.desc())
+        .limit(limit)
+    ).all()
+
+    if not rows:
+        return None, []
+    return rows[0][0], [msg for _, msg in rows if msg is not None]
+
+def get_history_version(db: Session, session_id: str) -> Tuple[Optional[int], Optional[Tuple[int, int]]]:
+    """Id da conversa e versão do histórico ``(maior id de mensagem, quantidade)``.
+
+    Consulta agregada coberta pelo índice de ``messages(conversation_id, ...)``;
+    serve para validar o cache de histórico sem trazer as mensagens.
+    """
+    row = db.execute(
+        select(models.Conversation.id, func.max(models.Message.id), func.count(models.Message.id))
+        .outerjoin(models.Message, models.Message.conversation_id == models.Conversation.id)
+        .where(models.Conversation.session_id == session_id)
+        .group_by(models.Conversation.id)
+    ).first()
+
+    if row is None:
+        return None, None
+    return row[0], (row[1] or 0, row[2])
+
+def save_turn(db: Session, session_id: str, conversation_id: Optional[int],
+              user_content: str, assistant_content: Optional[str] = None,
+              tokens_used: int = 0, received_at: Optional[datetime] = None) -> Tuple[int, Dict[str, int]]:
+    """Grava a mensagem do usuário e a resposta do assistente em uma única transação.
+
+    Cria a conversa se ``conversation_id`` for None (tolerando outra requisição
+    da mesma sessão que a tenha criado antes). ``received_at`` é o momento em
+    que a mensagem do usuário chegou (capturado antes da geração); a resposta
+    recebe o horário da gravação. Retorna ``(conversation_id, {papel: id da
+    mensagem gravada})``.
+    """
+    saved_at = datetime.now(timezone.utc)
+    try:
+        if conversation_id is None:
+            conversation_id = upsert_conversation(db, session_id)
+
+        rows = [{"conversation_id": conversation_id, "role": "user", "content": user_content,
+                 "tokens_used": 0, "timestamp": received_at or saved_at}]
+        if assistant_content is not None:
+            rows.append({"conversation_id": conversation_id, "role": "assistant",
+                         "content": assistant_content, "tokens_used": tokens_used, "timestamp": saved_at})
+        # Um único INSERT com as duas linhas (VALUES múltiplo) que já devolve os ids
+        inserted = db.execute(
+            insert(models.Message).values(rows).returning(models.Message.id, models.Message.role)
+        ).all()
+        message_ids = {role: id_ for id_, role in inserted}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return conversation_id, message_ids
+
+def upsert_conversation(db: Session, session_id: str) -> int:
+    """INSERT ... ON CONFLICT DO NOTHING seguido da leitura do id"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        db.execute(dialect_insert(models.Conversation)
+                   .values(session_id=session_id)
+                   .on_conflict_do_nothing(index_elements=["session_id"]))
+    else:
+        exists = db.execute(select(models.Conversation.id)
+                            .where(models.Conversation.session_id == session_id)).scalar()
+        if exists is not None:
+            return exists
+        db.add(models.Conversation(session_id=session_id))
+        db.flush()
+
+    return db.execute(select(models.Conversation.id)
+                      .where(models.Conversation.session_id == session_id)).scalar_one()
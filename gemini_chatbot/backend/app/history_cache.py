@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.crud import HISTORY_LIMIT
+
+# Versão do histórico de uma sessão no banco: (maior id de mensagem, quantidade de mensagens).
+# O maior id muda a cada gravação e a contagem denuncia gravações de outro worker
+# intercaladas com as deste, que o maior id sozinho não revelaria.
+Version = Tuple[int, int]
+
+def render_message(role: str, content: str) -> str:
+    """Linha do contexto para uma mensagem"""
+    speaker = "Usuário" if role == "user" else "Assistente"
+    return f"{speaker}: {content}\n"
+
+class _Entry:
+    __slots__ = ("lines", "version", "expires_at")
+
+    def __init__(self, lines: Deque[str], version: Version, expires_at: float):
+        self.lines = lines
+        self.version = version
+        self.expires_at = expires_at
+
+class HistoryCache:
+    """Cache em memória das últimas mensagens de cada sessão, já formatadas para o contexto.
+
+    Cada sessão guarda um ring buffer (``deque(maxlen=limit)``) com as linhas
+    em ordem cronológica; as sessões são descartadas por LRU acima de
+    ``max_sessions`` e por TTL. O banco continua sendo a fonte da verdade:
+    uma entrada só é usada se a versão informada (lida do banco) for a mesma
+    que ela guarda, o que mantém o contexto correto com vários workers do
+    uvicorn gravando a mesma sessão.
+    """
+
+    def __init__(self, limit: int, max_sessions: int, ttl: float):
+        self.limit = limit
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str, version: Version) -> Optional[List[str]]:
+        """Linhas do histórico (mais antigas primeiro) se a entrada estiver válida nessa versão"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.version != version or entry.expires_at < now:
+                if entry is not None:
+                    del self._entries[session_id]
+                self.misses += 1
+                return None
+            entry.expires_at = now + self.ttl
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return list(entry.lines)
+
+    def put(self, session_id: str, lines: List[str], version: Version):
+        """Substitui a entrada da sessão pelo histórico lido do banco"""
+        with self._lock:
+            self._store(session_id, _Entry(deque(lines, maxlen=self.limit), version, time.monotonic() + self.ttl))
+
+    def append(self, session_id: str, expected: Optional[Version], lines: List[str], ids: List[int]):
+        """Write-through das mensagens recém-gravadas (``ids``) no buffer da sessão.
+
+        ``expected`` é a versão lida antes da geração (None para conversa nova).
+        Se a entrada não estiver mais nessa versão, outra requisição mexeu no
+        histórico no meio tempo e a entrada é descartada para ser relida do banco.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if expected is None:
+                entry = _Entry(deque(maxlen=self.limit), (0, 0), 0.0)
+            elif entry is None or entry.version != expected:
+                self._entries.pop(session_id, None)
+                return
+            entry.lines.extend(lines)
+            entry.version = (max(ids), entry.version[1] + len(ids))
+            entry.expires_at = time.monotonic() + self.ttl
+            self._store(session_id, entry)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _store(self, session_id: str, entry: _Entry):
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        now = time.monotonic()
+        # Expiradas saem pela ponta menos recente; depois o LRU limita o tamanho
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.expires_at >= now and len(self._entries) <= self.max_sessions:
+                break
+            self._entries.popitem(last=False)
+
+history_cache = HistoryCache(HISTORY_LIMIT, settings.HISTORY_CACHE_MAX_SESSIONS, settings.HISTORY_CACHE_TTL)
@@ -0,0 +1,24 @@
+import httpx
+from app.config import settings
+
+# Cliente HTTP assíncrono compartilhado: todas as chamadas aos provedores reaproveitam
+# as mesmas conexões keep-alive em vez de abrir uma conexão TLS por requisição
+_async_http_client: httpx.AsyncClient = None
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=10.0)
+        )
+    return _async_http_client
+
+async def close_async_http_client():
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
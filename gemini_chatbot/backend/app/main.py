@@ -1,17 +1,26 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
-from typing import List
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+import json
 import uuid
 
-from app.database import get_db, engine
+from app.database import get_db, engine, SessionLocal
 from app import models
+from app import crud
 from app import schemas
+from app.history_cache import history_cache, render_message, Version
 from app.clients.gemini_client import GeminiClient
 from app.clients.openai_client import OpenAIClient
+from app.http_pool import close_async_http_client
 # Criar tabelas
 models.Base.metadata.create_all(bind=engine)
+# create_all não cria índices novos em tabelas que já existem
+for index in models.Message.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 app = FastAPI(title="Gemini Chatbot API", version="1.0.0")
 
@@ -30,61 +39,41 @@ llm_config = {"temperature": 1.0,
 
 gemini_client = OpenAIClient(llm_config)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_http_client()
+
 @app.post("/chat", response_model=schemas.ChatResponse)
 async def chat(
     request: schemas.ChatRequest,
     db: Session = Depends(get_db)
 ):
-    """Endpoint principal para chat"""
+    """Endpoint principal para chat.
+    
+    Uma consulta antes da geração (conversa + histórico) e uma única transação
+    depois dela (conversa, se nova, e as duas mensagens).
+    """
+    received_at = datetime.now(timezone.utc)
     try:
-        # Buscar ou criar conversa
-        conversation = db.query(models.Conversation).filter(
-            models.Conversation.session_id == request.session_id
-        ).first()
-        
-        if not conversation:
-            conversation = models.Conversation(session_id=request.session_id)
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-        
-        # Salvar mensagem do usuário
-        user_message = models.Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.message
-        )
-        db.add(user_message)
-        db.commit()
-        
-        # Buscar histórico para contexto
-        history_messages = db.query(models.Message).filter(
-            models.Message.conversation_id == conversation.id
-        ).order_by(models.Message.timestamp.desc()).limit(5).all()
-        
-        history_context = build_history_context(history_messages)
+        conversation_id, version, history_context = load_turn_context(db, request)
         
         # Gerar resposta com Gemini
-        gemini_response = gemini_client.generate_response(
+        gemini_response = await gemini_client.generate_response_async(
             prompt=request.message,
             context=history_context
         )
         
-        # Salvar resposta do assistente
-        assistant_message = models.Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=gemini_response["text"],
-            tokens_used=gemini_response["tokens_used"]
+        # Salvar mensagem do usuário e resposta do assistente
+        conversation_id, message_ids = crud.save_turn(
+            db, request.session_id, conversation_id, request.message,
+            gemini_response["text"], gemini_response["tokens_used"], received_at
         )
-        db.add(assistant_message)
-        db.commit()
-        db.refresh(assistant_message)
+        record_turn(request, version, message_ids, gemini_response["text"])
         
         return schemas.ChatResponse(
             response=gemini_response["text"],
-            conversation_id=conversation.id,
-            message_id=assistant_message.id,
+            conversation_id=conversation_id,
+            message_id=message_ids["assistant"],
             tokens_used=gemini_response["tokens_used"]
         )
         
@@ -92,18 +81,104 @@ async def chat(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-def build_history_context(messages: List[models.Message]) -> str:
-    """Constrói contexto do histórico de conversa"""
-    if not messages:
-        return ""
+@app.post("/chat/stream")
+async def chat_stream(
+    request: schemas.ChatRequest,
+    db: Session = Depends(get_db)
+):
+    """Variante do /chat que envia os tokens como server-sent events à medida que são gerados.
     
-    history = "Histórico recente da conversa:\n"
+    Eventos: ``token`` (``{"text": ...}``) para cada pedaço da resposta, depois
+    ``done`` (``{"conversation_id", "message_id", "tokens_used"}``) quando a
+    mensagem do assistente já foi gravada, ou ``error`` (``{"detail": ...}``).
+    """
+    received_at = datetime.now(timezone.utc)
+    try:
+        conversation_id, version, history_context = load_turn_context(db, request)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
     
-    for msg in reversed(messages):  # Ordem cronológica
-        role = "Usuário" if msg.role == "user" else "Assistente"
-        history += f"{role}: {msg.content}\n"
+    return StreamingResponse(
+        stream_chat_events(request, conversation_id, version, history_context, received_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_chat_events(request: schemas.ChatRequest, conversation_id: Optional[int],
+                             version: Optional[Version], history_context: str, received_at: datetime):
+    """Repassa o stream do provedor como SSE e grava o turno completo ao final.
+    
+    Roda depois que a sessão do request já pode ter sido fechada, por isso a
+    gravação usa uma sessão própria. Se a geração falhar, só a mensagem do
+    usuário é gravada.
+    """
+    async for event in gemini_client.generate_response_stream_async(prompt=request.message, context=history_context):
+        if "delta" in event:
+            yield sse_event("token", {"text": event["delta"]})
+            continue
+        
+        db = SessionLocal()
+        try:
+            if "error" in event:
+                _, message_ids = crud.save_turn(db, request.session_id, conversation_id, request.message,
+                                               received_at=received_at)
+                record_turn(request, version, message_ids)
+                yield sse_event("error", {"detail": event["error"]})
+                return
+            conversation_id, message_ids = crud.save_turn(
+                db, request.session_id, conversation_id, request.message,
+                event["text"], event["tokens_used"], received_at
+            )
+            record_turn(request, version, message_ids, event["text"])
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Erro ao salvar resposta: {str(e)}"})
+            return
+        finally:
+            db.close()
+        
+        yield sse_event("done", {
+            "conversation_id": conversation_id,
+            "message_id": message_ids["assistant"],
+            "tokens_used": event["tokens_used"]
+        })
+
+def sse_event(event: str, data: dict) -> str:
+    """Formata um server-sent event; o JSON mantém quebras de linha do texto em uma única linha data:"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def load_turn_context(db: Session, request: schemas.ChatRequest) -> Tuple[Optional[int], Optional[Version], str]:
+    """Retorna o id da conversa (None se nova), a versão do histórico e o contexto: 4 mensagens anteriores + a atual
     
-    return history
+    As mensagens anteriores vêm do cache em memória quando a versão lida do
+    banco confere; senão são buscadas e o cache da sessão é recarregado.
+    """
+    conversation_id, version = crud.get_history_version(db, request.session_id)
+    lines = []
+    if conversation_id is not None:
+        lines = history_cache.get(request.session_id, version)
+        if lines is None:
+            _, history_messages = crud.get_turn_context(db, request.session_id)
+            lines = [render_message(msg.role, msg.content) for msg in reversed(history_messages)]
+            history_cache.put(request.session_id, lines, version)
+    # A mensagem atual ainda não foi gravada; entra no contexto como a mais recente
+    lines.append(render_message("user", request.message))
+    return conversation_id, version, build_history_context(lines)
+
+def record_turn(request: schemas.ChatRequest, version: Optional[Version],
+                message_ids: Dict[str, int], response_text: Optional[str] = None):
+    """Write-through no cache de histórico das mensagens que acabaram de ser gravadas"""
+    lines = [render_message("user", request.message)]
+    if response_text is not None:
+        lines.append(render_message("assistant", response_text))
+    history_cache.append(request.session_id, version, lines, list(message_ids.values()))
+
+def build_history_context(lines: Iterable[str]) -> str:
+    """Constrói contexto do histórico de conversa a partir das linhas em ordem cronológica"""
+    body = "".join(lines)
+    if not body:
+        return ""
+    return "Histórico recente da conversa:\n" + body
 
 @app.get("/conversations/{session_id}", response_model=schemas.ConversationResponse)
 async def get_conversation(session_id: str, db: Session = Depends(get_db)):
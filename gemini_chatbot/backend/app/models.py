@@ -2,7 +2,7 @@ from app.database import Base
 from sqlalchemy import Column, Integer, String, DateTime, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -16,6 +16,10 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # Histórico de uma conversa em ordem de tempo, direto pelo índice
+    __table_args__ = (
+        Index("ix_messages_conversation_id_timestamp", "conversation_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey('conversations.id'))
@@ -1,4 +1,6 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from app.config import settings
+from app.http_pool import get_async_http_client
 from app.schemas import LLMParameters
 
 
@@ -12,9 +14,11 @@ class OpenAIResponse:
 class OpenAIGenerativeModel:
     def __init__(self,model_name="gpt-4o-mini", generation_config: LLMParameters = None):
         self.client = OpenAI()
+        # Versão assíncrona sobre o pool HTTP compartilhado
+        self.async_client = AsyncOpenAI(http_client=get_async_http_client(), timeout=settings.OPENAI_TIMEOUT)
         self.model_name = model_name
-        generation_config.pop('top_k',None) # Openai não tem o parâmetro top_k
-        self.config = generation_config
+        # Openai não tem o parâmetro top_k; copia para não alterar o dicionário recebido
+        self.config = {k: v for k, v in (generation_config or {}).items() if k != 'top_k'}
     
     def generate_content(self, full_prompt):
         response = self.client.chat.completions.create(
@@ -24,4 +28,26 @@ class OpenAIGenerativeModel:
         )
         
         # Retornar objeto com atributo .text (mesma interface do Gemini)
-        return OpenAIResponse(text=response.choices[0].message.content)
\ No newline at end of file
+        return OpenAIResponse(text=response.choices[0].message.content)
+    
+    async def generate_content_async(self, full_prompt, stream: bool = False, request_options: dict = None):
+        """Equivalente assíncrono de generate_content (mesma assinatura do genai, incluindo request_options)"""
+        timeout = (request_options or {}).get("timeout", settings.OPENAI_TIMEOUT)
+        response = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": full_prompt}],
+            stream=stream,
+            timeout=timeout,
+            **self.config
+        )
+        
+        if stream:
+            return self._aiter_chunks(response)
+        
+        return OpenAIResponse(text=response.choices[0].message.content)
+    
+    async def _aiter_chunks(self, response):
+        """Converte o stream da OpenAI em pedaços com atributo .text, como o stream do Gemini"""
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield OpenAIResponse(text=chunk.choices[0].delta.content)
\ No newline at end of file
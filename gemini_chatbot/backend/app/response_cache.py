@@ -0,0 +1,140 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+# Dimensão do vetor de n-gramas (hashing trick) usado na camada por similaridade
+EMBEDDING_DIM = 4096
+NGRAM = 3
+
+def normalize_text(text: str) -> str:
+    """Minúsculas e espaços colapsados: variações triviais caem na mesma chave"""
+    return re.sub(r"\s+", " ", (text or "").casefold()).strip()
+
+def embed(text: str) -> Dict[int, float]:
+    """Embedding local e esparso: trigramas de caracteres (com hashing) normalizados em L2"""
+    padded = f" {text} "
+    counts = Counter(zlib.crc32(padded[i:i + NGRAM].encode("utf-8")) % EMBEDDING_DIM
+                     for i in range(max(len(padded) - NGRAM + 1, 1)))
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {index: value / norm for index, value in counts.items()}
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+class _Entry:
+    __slots__ = ("scope", "vector", "response")
+
+    def __init__(self, scope: str, vector: Optional[Dict[int, float]], response: Dict):
+        self.scope = scope
+        self.vector = vector
+        self.response = response
+
+class ResponseCache:
+    """Cache das respostas dos provedores para prompts repetidos.
+
+    O escopo é o hash do modelo, da configuração de geração e do contexto
+    normalizado; a chave acrescenta o prompt normalizado. A camada exata é um
+    LRU limitado a ``max_entries``. A camada por similaridade, opcional, só
+    compara prompts dentro do mesmo escopo (mesmo histórico), pelo cosseno de
+    um embedding de trigramas do prompt calculado localmente, e aceita o mais
+    parecido acima de ``similarity``. Cada escopo guarda no máximo
+    ``candidates`` prompts para essa comparação, o que limita o custo da
+    busca (feita no event loop) independentemente do tamanho do cache.
+    """
+
+    def __init__(self, max_entries: int, semantic: bool = False, similarity: float = 0.95,
+                 candidates: int = 64):
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self.candidates = candidates
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Escopo -> chaves mais recentes desse escopo comparadas pela camada por similaridade
+        self._scopes: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def key(self, model_name: str, llm_config: Dict, prompt: str, context: str = None) -> Tuple[str, str, str]:
+        """``(chave, escopo, prompt normalizado)`` de uma chamada"""
+        prompt = normalize_text(prompt)
+        context = normalize_text(context)
+        # O contexto montado pelo backend termina repetindo a pergunta atual; sem ela,
+        # o escopo é só o histórico anterior e perguntas parecidas podem ser comparadas
+        if prompt and context.endswith(prompt):
+            context = context[:-len(prompt)]
+        scope = hashlib.sha256(json.dumps([model_name, llm_config, context], sort_keys=True, default=str)
+                               .encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{scope}\n{prompt}".encode("utf-8")).hexdigest()
+        return key, scope, prompt
+
+    def get(self, key: str, scope: str, prompt: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry.response)
+            if self.semantic and scope in self._scopes:
+                best_key, best = self._most_similar(scope, embed(prompt))
+                if best_key is not None and best >= self.similarity:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return dict(self._entries[best_key].response)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, scope: str, prompt: str, response: Dict):
+        vector = embed(prompt) if self.semantic else None
+        with self._lock:
+            self._entries[key] = _Entry(scope, vector, dict(response))
+            self._entries.move_to_end(key)
+            if self.semantic:
+                keys = self._scopes.setdefault(scope, OrderedDict())
+                keys[key] = None
+                keys.move_to_end(key)
+                while len(keys) > self.candidates:
+                    keys.popitem(last=False)
+            while len(self._entries) > self.max_entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._forget(evicted_key, evicted.scope)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "semantic_hits": self.semantic_hits, "misses": self.misses}
+
+    def _forget(self, key: str, scope: str):
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._scopes[scope]
+
+    def _most_similar(self, scope: str, vector: Dict[int, float]) -> Tuple[Optional[str], float]:
+        best_key, best = None, 0.0
+        for key in self._scopes[scope]:
+            score = cosine(vector, self._entries[key].vector)
+            if score > best:
+                best_key, best = key, score
+        return best_key, best
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES,
+                               semantic=settings.RESPONSE_CACHE_SEMANTIC,
+                               similarity=settings.RESPONSE_CACHE_SIMILARITY,
+                               candidates=settings.RESPONSE_CACHE_SEMANTIC_CANDIDATES)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Os testes importam o pacote ``app`` a partir da raiz do backend, com um banco SQLite temporário
+# e uma chave falsa (as chamadas ao provedor são substituídas em cada teste)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/chat.db")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.clients import abstract_client
+from app.response_cache import ResponseCache, response_cache
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Substitui a chamada ao provedor do cliente do backend, contando as chamadas"""
+    calls = []
+
+    async def create(model, messages, stream=False, timeout=None, **config):
+        calls.append(config)
+        message = types.SimpleNamespace(content=f"resposta {len(calls)}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(main.gemini_client.model.async_client.chat.completions, "create", create)
+    response_cache.clear()
+    yield calls
+    response_cache.clear()
+
+
+def test_repeated_prompt_is_served_from_cache(provider):
+    before = response_cache.stats()
+    with TestClient(main.app) as client:
+        first = client.post("/chat", json={"message": "Qual é a capital do Brasil?", "session_id": "a"}).json()
+        second = client.post("/chat", json={"message": "qual é a  capital do brasil?", "session_id": "b"}).json()
+
+    assert main.gemini_client.llm_config == main.llm_config
+    assert provider == [{"temperature": 1.0, "top_p": 1.0}]
+    assert second["response"] == first["response"] == "resposta 1"
+    assert response_cache.stats()["hits"] == before["hits"] + 1
+
+
+def test_similar_prompt_is_served_by_similarity_tier(provider, monkeypatch):
+    semantic = ResponseCache(100, semantic=True, similarity=0.8)
+    monkeypatch.setattr(abstract_client, "response_cache", semantic)
+    with TestClient(main.app) as client:
+        client.post("/chat", json={"message": "Qual é a capital do Brasil?", "session_id": "c"})
+        similar = client.post("/chat", json={"message": "Qual a capital do Brasil?", "session_id": "d"}).json()
+
+    assert len(provider) == 1
+    assert similar["response"] == "resposta 1"
+    assert semantic.stats()["semantic_hits"] == 1
@@ -2,21 +2,24 @@ from dotenv import load_dotenv
 import os
 import requests
 import json
+import time
 import uuid
 
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
+from rich.live import Live
 from rich import print as rprint
 import sys
 
 load_dotenv()
 
 class ChatClient:
-    def __init__(self, ip_servidor):
+    def __init__(self, ip_servidor, stream=False):
         self.base_url = os.getenv("API_URL", f"http://{ip_servidor}:8000")
         self.session_id = str(uuid.uuid4())
         self.console = Console()
+        self.stream = stream
         
     def start_chat(self):
         """Inicia a sessão de chat"""
@@ -24,6 +27,7 @@ class ChatClient:
             Panel.fit(
                 "[bold blue]🤖 Gemini ChatBot[/bold blue]\n"
                 f"[dim]Sessão: {self.session_id}[/dim]\n"
+                f"[dim]Modo: {'streaming' if self.stream else 'resposta completa'}[/dim]\n"
                 "Digite 'sair' para encerrar ou 'ajuda' para comandos",
                 border_style="green"
             )
@@ -42,9 +46,17 @@ class ChatClient:
                 elif user_input.lower() == 'historico':
                     self._show_history()
                     continue
+                elif user_input.lower() == 'stream':
+                    self.stream = not self.stream
+                    self.console.print(f"[green]Streaming {'ativado' if self.stream else 'desativado'}[/green]")
+                    continue
                 elif not user_input:
                     continue
                 
+                if self.stream:
+                    self._stream_message(user_input)
+                    continue
+                
                 with self.console.status("[bold green]Aguarde...[/bold green]", spinner="dots") as status:
                     # Enviar mensagem para API
                     response = self._send_message(user_input)
@@ -74,6 +86,61 @@ class ChatClient:
         
         return response.json()
     
+    def _stream_message(self, message: str):
+        """Envia a mensagem para /chat/stream e exibe a resposta enquanto ela é gerada"""
+        payload = {
+            "message": message,
+            "session_id": self.session_id
+        }
+        
+        start = time.perf_counter()
+        first_token = None
+        text = ""
+        
+        with requests.post(f"{self.base_url}/chat/stream", json=payload, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Erro na API: {response.text}")
+            
+            with Live(self._response_panel("", "[dim]Aguarde...[/dim]"), console=self.console,
+                      refresh_per_second=12) as live:
+                for event, data in self._iter_sse(response):
+                    if event == "token":
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        text += data["text"]
+                        live.update(self._response_panel(text, "[dim]Gerando...[/dim]"))
+                    elif event == "done":
+                        subtitle = (f"[dim]Tokens usados: {data['tokens_used']} | "
+                                    f"Primeiro token: {first_token or 0:.2f}s | "
+                                    f"Total: {time.perf_counter() - start:.2f}s[/dim]")
+                        live.update(self._response_panel(text, subtitle))
+                    elif event == "error":
+                        raise Exception(data.get("detail", "Erro desconhecido"))
+    
+    def _iter_sse(self, response):
+        """Lê os server-sent events da resposta, devolvendo (evento, dados)"""
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+    
+    def _response_panel(self, text: str, subtitle: str) -> Panel:
+        return Panel(
+            Markdown(text),
+            title="[bold green]🤖 Assistente[/bold green]",
+            title_align="left",
+            border_style="blue",
+            subtitle=subtitle
+        )
+    
     def _display_response(self, response: dict):
         """Exibe a resposta formatada"""
         response_text = response.get("response", "Sem resposta")
@@ -98,6 +165,7 @@ class ChatClient:
 [b]Comandos disponíveis:[/b]
 • [yellow]sair[/yellow] - Encerra o chat
 • [yellow]historico[/yellow] - Mostra histórico da conversa
+• [yellow]stream[/yellow] - Liga/desliga a exibição da resposta enquanto é gerada
 • [yellow]ajuda[/yellow] - Mostra esta mensagem
 
 [b]Exemplos de perguntas:[/b]
@@ -124,9 +192,10 @@ class ChatClient:
             self.console.print(f"[red]Erro ao buscar histórico: {str(e)}[/red]")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        ip_servidor = sys.argv[1]
-        client = ChatClient(ip_servidor)
+    args = [arg for arg in sys.argv[1:] if arg != "--stream"]
+    if args:
+        ip_servidor = args[0]
+        client = ChatClient(ip_servidor, stream="--stream" in sys.argv[1:])
         client.start_chat()
     else:
-        print("Por favor forneça o IP do servidor")
+        print("Por favor forneça o IP do servidor (use --stream para ver a resposta enquanto é gerada)")